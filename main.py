@@ -2,7 +2,8 @@ import hydralit as hy
 import streamlit as st
 
 from src.apps import DiscountApp, EntityApp, OrderApp
-from src.apps.utils import get_entity_from_df, get_entity_identifier_column
+from src.apps.utils import get_entity_from_loader, get_entity_identifier_column
+from src.database.indexes import ensure_indexes
 from src.database.loader import preload_data
 from src.database.tables import (
     CustomerTable,
@@ -30,15 +31,20 @@ def main():
         InventoryTable(),
         OrdersTable(),
     ]
-    st.session_state.dataloader = preload_data(tables)
+    ensure_indexes(tables)
+    if "dataloader" not in st.session_state:
+        st.session_state.dataloader = preload_data(tables)
+    # picks up orders and entities saved by other sessions since the last rerun
+    st.session_state.dataloader.refresh_changed()
 
     # app.add_app('Home', app=HomeApp(), is_home=True)
 
     # TODO: this is set in login page
     st.session_state.current_user = MANAGER_ID
-    manager = get_entity_from_df(
+    manager = get_entity_from_loader(
         entity_type=Manager,
-        df=st.session_state.dataloader.data[ManagerTable.name()],
+        dataloader=st.session_state.dataloader,
+        table_name=ManagerTable.name(),
         entity_identifier_column=get_entity_identifier_column(Manager, "id"),
         entity_identifier=st.session_state.current_user,
     )
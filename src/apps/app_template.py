@@ -1,21 +1,29 @@
+import importlib
+import os
 from abc import abstractmethod
 from datetime import datetime
 from enum import Enum, EnumMeta
-from typing import Any, Type, Union
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, List, Optional, Type, Union
 
 import pandas as pd
 import streamlit as st
 from config.formats import DATE_FORMAT
 from hydralit import HydraHeadApp
-from src import entities, processing
+from src import entities
 from src.config import COLUMN_NAME_SEPARATOR, ID_SUFFIX
 from src.database.exporter import Exporter
 from src.database.loader import Loader
+from src.database.table_export import ExportFormat, TableExport
 from src.database.tables import BaseTable
 from src.entities import AccessLevel, Entity
+from src.entity_cache import entity_cache
 
 from .utils import generate_id, get_entity_from_selectbox, get_entity_identifier_column
 
+if TYPE_CHECKING:
+    from src.processing import ProcessingStrategy
+
 VALUE_TYPE_WIDGET_MAP = {
     list: st.selectbox,
     str: st.text_input,
@@ -25,6 +33,12 @@ VALUE_TYPE_WIDGET_MAP = {
 
 
 class AppTemplate(HydraHeadApp):
+    # tables read by the page besides output_table, loaded when the page runs
+    required_tables: List[Type[BaseTable]] = []
+    # tables the page has to wait for before it renders, all of the above when None,
+    # the others keep loading in the background
+    render_tables: Optional[List[Type[BaseTable]]] = None
+
     def __init__(
         self, entity_type: Type[Entity], output_table: BaseTable, dataloader: Loader
     ) -> None:
@@ -32,22 +46,34 @@ class AppTemplate(HydraHeadApp):
         self.entity_type_name = entity_type.name()
         self.dataloader = dataloader
         self.output_table = output_table
-        self.entity_processor: processing.ProcessingStrategy = self._get_entity_processor()
         self.entity_to_edit: Entity
 
-    def _get_entity_processor(self) -> processing.ProcessingStrategy:
+    @cached_property
+    def entity_processor(self) -> Type["ProcessingStrategy"]:
+        # processing is imported when a page first saves, not on app start
+        processing = importlib.import_module("src.processing")
         return getattr(processing, self.output_table.processing)
 
     @abstractmethod
     def run(self) -> None:
         ...
 
+    def load_required_tables(self) -> None:
+        placeholder = st.empty()
+        self.dataloader.ensure_loaded(
+            [type(self.output_table)] + self.required_tables,
+            wait_for=self.render_tables,
+            progress=lambda names: placeholder.info(f"Loading {', '.join(names)}..."),
+        )
+        placeholder.empty()
+
     def select_entity_to_edit(self) -> Union[Entity, None]:
         entity_identifier_column = get_entity_identifier_column(self.entity_type, "name")
         st.write(f"Edit existing {self.entity_type_name} details")
         return get_entity_from_selectbox(
             entity_type=self.entity_type,
-            df=self.dataloader.data[self.output_table.name()],
+            dataloader=self.dataloader,
+            table_name=self.output_table.name(),
             entity_identifier_column=entity_identifier_column,
         )
 
@@ -80,28 +106,65 @@ class AppTemplate(HydraHeadApp):
             attribute_name: _get_input_widget(attribute_name, attribute_type)
             for attribute_name, attribute_type in self.entity_type.schema().items()
         }
-        return self.entity_type(**entity_info_dict)
+        return entity_cache.from_values(self.entity_type, entity_info_dict)
 
     @staticmethod
     def save_entity_df(entity_df: pd.DataFrame, output_table: BaseTable) -> None:
         Exporter().append_df_to_database(entity_df, output_table)
         st.success(f"Exported to {output_table.table_name} table")
 
+    def export_columns(self, table_export: TableExport) -> List[str]:
+        """Columns offered for export, read from the database once per table version,
+        not on every render and without waiting for the table to load"""
+        name = self.output_table.name()
+        version = self.dataloader.cache.version(name)
+        cached = st.session_state.get(f"{name}_export_columns")
+        if cached is None or cached[0] != version:
+            cached = (version, table_export.available_columns())
+            st.session_state[f"{name}_export_columns"] = cached
+        return cached[1]
+
     def download_data(self):
-        @st.cache
-        def convert_df_to_csv(df):
-            # IMPORTANT: Cache the conversion to prevent computation on every rerun
-            return df.to_csv(sep=";", index=False).encode("utf-8")
-
-        if st.session_state.current_user_access != AccessLevel.user.value:
-            data = self.dataloader.data[self.output_table.name()]
-            data = convert_df_to_csv(data)
-            output_name = COLUMN_NAME_SEPARATOR.join(
-                [self.output_table.name(), datetime.now().strftime(DATE_FORMAT)]
-            )
-            st.download_button(
-                label=f"Download {self.entity_type_name} data",
-                data=data,
-                file_name=output_name + ".csv",
-                mime="text/csv",
-            )
+        """Export of the output table, streamed from the database into a file of the export
+        directory when requested, so no copy of the table is encoded on page renders"""
+        if st.session_state.current_user_access == AccessLevel.user.value:
+            return
+        export_key = f"{self.output_table.name()}_export"
+        with st.expander(f"Download {self.entity_type_name} data"):
+            table_export = TableExport(
+                self.output_table, database=self.dataloader.executor.database)
+            columns = self.export_columns(table_export)
+            with st.form(export_key):
+                export_format = st.selectbox(
+                    "Format", ExportFormat.available(), format_func=lambda x: x.value)
+                table_export.columns = st.multiselect(
+                    "Columns, all when empty", columns)
+                table_export.date_column = st.selectbox(
+                    "Filter by date", [None] + table_export.date_columns(columns))
+                date_range = st.date_input("Date range", [])
+                prepared = st.form_submit_button("Prepare export")
+            if prepared:
+                # a range being picked has only its start date
+                dates = list(date_range) + [None, None]
+                table_export.start_date, table_export.end_date = dates[0], dates[1]
+                path = table_export.write_file(export_format)
+                previous = st.session_state.get(export_key)
+                if previous is not None and os.path.exists(previous[0]):
+                    os.remove(previous[0])
+                st.session_state[export_key] = (path, export_format)
+            if export_key in st.session_state:
+                path, export_format = st.session_state[export_key]
+                if not os.path.exists(path):  # swept after EXPORT_MAX_AGE
+                    del st.session_state[export_key]
+                    st.info("The prepared export expired, prepare it again")
+                    return
+                output_name = COLUMN_NAME_SEPARATOR.join(
+                    [self.output_table.name(), datetime.now().strftime(DATE_FORMAT)]
+                )
+                with open(path, "rb") as file:
+                    st.download_button(
+                        label=f"Download {self.entity_type_name} data",
+                        data=file,
+                        file_name=f"{output_name}.{export_format.value}",
+                        mime=export_format.mime,
+                    )
@@ -1,9 +1,11 @@
+from datetime import date
 from typing import Type
 
 import pandas as pd
 import streamlit as st
 from src.database.loader import Loader
-from src.database.tables import BaseTable, DiscountTable, ProductTable
+from src.database.tables import BaseTable, ProductTable
+from src.discount_index import get_discount_index
 from src.entities import Discount, DiscountLevel, Entity
 
 from .app_template import AppTemplate
@@ -11,10 +13,13 @@ from .utils import generate_id
 
 
 class DiscountApp(AppTemplate):
+    required_tables = [ProductTable]
+
     def __init__(self, entity_type: Type[Entity], output_table: BaseTable, dataloader: Loader):
         super().__init__(entity_type, output_table, dataloader)
 
     def run(self):
+        self.load_required_tables()
 
         self.download_data()
 
@@ -35,9 +40,6 @@ class DiscountApp(AppTemplate):
                 product_df = self.dataloader.data[ProductTable.name()]
                 discount_identifiers = set(product_df[discount_level])
                 discount_identifier = st.selectbox("Discount identifier", discount_identifiers)
-            is_active = self.check_active_discounts_on_all_levels(
-                product_df, discount_level, discount_identifier
-            )
 
             with start_date_col:
                 start_date = st.date_input("Discount start date")
@@ -45,6 +47,10 @@ class DiscountApp(AppTemplate):
             with end_date_col:
                 end_date = st.date_input("Discount end date")
 
+            is_active = self.check_active_discounts_on_all_levels(
+                discount_level, discount_identifier, start_date, end_date
+            )
+
             with discount_percent_col:
                 discount_percent = st.number_input(
                     "Discount percent", min_value=0.0, max_value=100.0
@@ -67,19 +73,20 @@ class DiscountApp(AppTemplate):
                     self.dataloader.update(self.output_table)
 
     def check_active_discounts_on_all_levels(
-        self, product_df: pd.DataFrame, discount_level: str, discount_identifier: str
+        self, discount_level: str, discount_identifier: str, start_date: date, end_date: date
     ) -> bool:
+        """Whether discounts on the level or the levels above it overlap the date range"""
         res = []
 
         res.append(
             self.check_active_discount(
-                discount_level=discount_level, discount_identifier=discount_identifier
+                discount_level=discount_level,
+                discount_identifier=discount_identifier,
+                start_date=start_date,
+                end_date=end_date,
             )
         )
 
-        def discount_level_condition(x):
-            return x[discount_level] == discount_identifier
-
         for current_level, levels_to_check in [
             (
                 DiscountLevel.product_name.name,
@@ -88,26 +95,35 @@ class DiscountApp(AppTemplate):
             (DiscountLevel.product_category.name, [DiscountLevel.manufacturer.name]),
         ]:
             if discount_level == current_level:
+                product = self.dataloader.lookup(
+                    ProductTable.name(), discount_level, discount_identifier
+                )
                 for product_attribute in levels_to_check:
-                    identifier = product_df.loc[discount_level_condition, product_attribute].values[
-                        0
-                    ]
+                    identifier = product[product_attribute]
                     res.append(
                         self.check_active_discount(
-                            discount_level=product_attribute, discount_identifier=identifier
+                            discount_level=product_attribute,
+                            discount_identifier=identifier,
+                            start_date=start_date,
+                            end_date=end_date,
                         )
                     )
 
         return any(res)
 
-    def check_active_discount(self, discount_level: str, discount_identifier: str) -> bool:
-        active_discount_df = self.dataloader.data[DiscountTable.name()].loc[
-            lambda x: (x["discount_level"] == discount_level)
-            & (x["discount_identifier"] == discount_identifier)
-        ]
-        if active_discount_df.shape[0] > 0:
+    def check_active_discount(
+        self, discount_level: str, discount_identifier: str, start_date: date, end_date: date
+    ) -> bool:
+        active_discounts = get_discount_index(self.dataloader).overlapping(
+            DiscountLevel[discount_level], discount_identifier, start_date, end_date
+        )
+        if active_discounts:
             st.write(f"Active discount on {discount_level} {discount_identifier}")
-            st.write(active_discount_df[Discount.attribute_list()])
+            st.write(
+                pd.DataFrame(active_discounts)[Discount.attribute_list()].assign(
+                    discount_level=discount_level
+                )
+            )
             return True
         else:
             return False
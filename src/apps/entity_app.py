@@ -14,6 +14,7 @@ class EntityApp(AppTemplate):
         self.entity_to_edit: Optional[Entity] = None
 
     def run(self):
+        self.load_required_tables()
 
         self.download_data()
 
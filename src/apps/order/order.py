@@ -3,17 +3,26 @@ from typing import Tuple
 
 import streamlit as st
 from src.database.loader import Loader
-from src.database.tables import CustomerTable, ManagerTable, ProductTable
+from src.database.tables import CustomerTable, DiscountTable, ManagerTable, ProductTable
 from src.entities import Customer, Manager, Orders, OrderType, Product
 
 from ..app_template import AppTemplate
-from ..utils import get_entity_from_df, get_entity_from_selectbox, get_entity_identifier_column
+from ..utils import (
+    get_entity_from_loader,
+    get_entity_from_selectbox,
+    get_entity_identifier_column,
+)
 from .product_info import ProductInfo
 from .summary import OrderSummary
 
 
 class OrderApp(AppTemplate):
+    required_tables = [ManagerTable, CustomerTable, ProductTable, DiscountTable]
+    # orders are only written by the page, so it renders without waiting for them
+    render_tables = required_tables
+
     def run(self):
+        self.load_required_tables()
         product, customer = None, None
 
         manager = self.write_manager_info()
@@ -23,7 +32,7 @@ class OrderApp(AppTemplate):
         order_date, order_type, customer = self.date_order_type_and_customer_selection()
 
         if customer:
-            product, selected_quantity, discount = self.product_selection(customer)
+            product, selected_quantity, discount = self.product_selection(customer, order_date)
 
         if product and customer:
             order_row = Orders(
@@ -40,7 +49,6 @@ class OrderApp(AppTemplate):
                 st.session_state.order_rows.append(order_row)
 
             if len(st.session_state.order_rows) > 0:
-                order_df = self.entity_processor().process(st.session_state.order_rows)
                 order_summary = OrderSummary(
                     order_rows=st.session_state.order_rows,
                     buyer=customer,
@@ -49,15 +57,16 @@ class OrderApp(AppTemplate):
                 order_summary.show()
 
                 if order_summary.submitted:
-                    order_df = order_summary.df
+                    order_df = order_summary.df_to_save()
                     self.save_entity_df(order_df, output_table=self.output_table)
                     self.dataloader.update(self.output_table)
                     st.session_state.order_rows = []
 
     def write_manager_info(self: Loader) -> Manager:
-        manager = get_entity_from_df(
+        manager = get_entity_from_loader(
             entity_type=Manager,
-            df=self.dataloader.data[ManagerTable.name()],
+            dataloader=self.dataloader,
+            table_name=ManagerTable.name(),
             entity_identifier_column=get_entity_identifier_column(Manager, "id"),
             entity_identifier=st.session_state.current_user,
         )
@@ -75,15 +84,19 @@ class OrderApp(AppTemplate):
                 order_type = st.selectbox("Order type", [e.value for e in OrderType])
 
             with customer_col:
-                df = self.dataloader.data[CustomerTable.name()]
                 entity_identifier_column = get_entity_identifier_column(Customer, "name")
                 customer = get_entity_from_selectbox(
-                    entity_type=Customer, df=df, entity_identifier_column=entity_identifier_column
+                    entity_type=Customer,
+                    dataloader=self.dataloader,
+                    table_name=CustomerTable.name(),
+                    entity_identifier_column=entity_identifier_column,
                 )
 
         return order_date, order_type, customer
 
-    def product_selection(self, customer: Customer) -> Tuple[Product, int, float]:
+    def product_selection(
+        self, customer: Customer, order_date: date
+    ) -> Tuple[Product, int, float]:
         with st.container():
             product_col, quantity_col = st.columns([4, 1])
             active_discount = 0.0
@@ -91,12 +104,13 @@ class OrderApp(AppTemplate):
             with product_col:
                 product = get_entity_from_selectbox(
                     entity_type=Product,
-                    df=self.dataloader.data[ProductTable.name()],
+                    dataloader=self.dataloader,
+                    table_name=ProductTable.name(),
                     entity_identifier_column=get_entity_identifier_column(Product, "name"),
                 )
                 if product:
                     product_info = ProductInfo(self.dataloader)
-                    product_info.show(product, customer)
+                    product_info.show(product, customer, order_date)
                     active_discount = product_info.active_discount
 
             with quantity_col:
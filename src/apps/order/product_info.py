@@ -1,9 +1,12 @@
-from ..utils import get_entity_identifier_column
 from src.database.loader import Loader
+from src.database.stock_ledger import StockLedger
+from src.discount_index import LEVEL_PRIORITY, get_discount_index
 from src.entities import Customer, Product
-from src.database.tables import DiscountTable, InventoryTable
+from src.pricing import pricing_engine
 
+import pandas as pd
 import streamlit as st
+from datetime import date
 
 
 class ProductInfo:
@@ -12,37 +15,37 @@ class ProductInfo:
         self.dataloader = dataloader
         self.active_discount: float = 0.
 
-    def show(self, product: Product, customer: Customer):
+    def show(self, product: Product, customer: Customer, order_date: date):
         self.check_inventory(product)
         self.calculate_price_for_customer(product, customer)
-        self.show_active_discount(product)
+        self.show_active_discount(product, order_date)
 
     def check_inventory(self, product: Product) -> None:
-        quantity_left = self.dataloader.data[InventoryTable.name()] \
-            .set_index(get_entity_identifier_column(Product, 'name')) \
-            .loc[product.product_name].values[0]
+        quantity_left = StockLedger(database=self.dataloader.executor.database) \
+            .quantity_left(product.product_name)
         st.write(f'Left in stock: {quantity_left}')
 
     @staticmethod
     def calculate_price_for_customer(product: Product, customer: Customer):
-        price = round(product.cost * customer.pricing_factor.value, 2)
+        price = pricing_engine.unit_price(product.cost, customer.pricing_factor.value)
         st.write(f'Price for customer before discount/VAT: {price}')
 
-    def show_active_discount(self, product: Product) -> None:
-        discount_df = self.dataloader.data[DiscountTable.name()]
+    def show_active_discount(self, product: Product, order_date: date) -> None:
+        discount_index = get_discount_index(self.dataloader)
 
-        def discount_condition(x):
-            return (x['discount_identifier'] == product.product_name) \
-                | (x['discount_identifier'] == product.product_category) \
-                | (x['discount_identifier'] == product.manufacturer)
+        columns_to_show = ['discount_level', 'discount_percent', 'start_date', 'end_date']
 
-        columns_to_show = ['discount_percent', 'start_date', 'end_date']
-
-        active_discounts = discount_df \
-            .loc[lambda x: discount_condition(x), columns_to_show]
-        if active_discounts.shape[0] > 0:
+        active_discounts = [
+            discount for level in LEVEL_PRIORITY
+            for discount in discount_index.overlapping(
+                level, getattr(product, level.value), order_date)
+        ]
+        if active_discounts:
             st.write('Active discounts for selected product:')
-            st.write(active_discounts)
-            self.active_discount = active_discounts['discount_percent'].values[0]
+            st.write(pd.DataFrame(active_discounts)[columns_to_show]
+                     .assign(discount_level=lambda x: x['discount_level'].map(lambda y: y.value)))
+            # the most specific level valid on the order date applies
+            discount = discount_index.resolve(product, order_date)
+            self.active_discount = discount.discount_percent if discount else 0.
         else:
             st.write('No active discounts')
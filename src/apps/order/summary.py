@@ -1,29 +1,14 @@
-from typing import List
+from dataclasses import dataclass, replace
+from typing import TYPE_CHECKING, List, Optional
 
 import pandas as pd
 import streamlit as st
-from config.paths import INVOICE_PATH
 from src.apps import utils
-from src.entities import Customer, CustomerType, Orders, PaymetTerms
-from src.invoice.base import InvoiceInfo, InvoiceType
-from src.invoice.vat import VATInvoice
-from src.processing import ProcessingStrategy
-
-# TODO: need to have method to load seller from customer table
-seller = Customer(
-    customer_id="0",
-    customer_name="UAB Medexy",
-    customer_type=CustomerType.default,
-    pricing_factor=1.0,
-    payment_terms=PaymetTerms.days_30,
-    address="Ukmergers g. 241",
-    post_code="LT-12345",
-    customer_location="Vilnius",
-    email="info@medexy.lt",
-    telephone="+370 526 53483",
-    customer_code="300154866",
-    vat_code="LT24 3500 0100 0132 3457",
-)
+from src.entities import Customer, Orders
+from src.pricing import OrderTotals, PricedOrder
+
+if TYPE_CHECKING:
+    from src.processing import OrderProcessing
 
 ORDER_SUMMARY_COLUMNS = [
     "order_id",
@@ -37,19 +22,76 @@ ORDER_SUMMARY_COLUMNS = [
     "payment_due",
 ]
 
+# session state key of the last processed cart
+PROCESSED_ORDER_KEY = "processed_order"
+
+
+@dataclass
+class ProcessedOrder:
+    # order rows are never modified once added to the cart, so they are matched by identity
+    rows: List[Orders]
+    priced: PricedOrder
+
+    @property
+    def df(self) -> pd.DataFrame:
+        return self.priced.df
+
+    @property
+    def totals(self) -> OrderTotals:
+        return self.priced.totals
+
 
 class OrderSummary:
     def __init__(
-        self, order_rows: List[Orders], buyer: Customer, processor: ProcessingStrategy
+        self, order_rows: List[Orders], buyer: Customer, processor: "OrderProcessing"
     ) -> None:
         self.order_rows = order_rows
         self.buyer = buyer
         self.processor = processor
         self.submitted: bool = False
 
+    @property
+    def processed(self) -> ProcessedOrder:
+        """Processed cart, recomputed only for order rows added since the last access"""
+        processed = st.session_state.get(PROCESSED_ORDER_KEY)
+        if processed is None or not self.is_processed(processed):
+            processed = ProcessedOrder(
+                rows=list(self.order_rows), priced=self.process_changes(processed)
+            )
+            st.session_state[PROCESSED_ORDER_KEY] = processed
+        return processed
+
     @property
     def df(self) -> pd.DataFrame:
-        return self.processor.process(self.order_rows)
+        return self.processed.df
+
+    def is_processed(self, processed: ProcessedOrder) -> bool:
+        return len(processed.rows) == len(self.order_rows) and all(
+            x is y for x, y in zip(processed.rows, self.order_rows)
+        )
+
+    def process_changes(self, processed: Optional[ProcessedOrder]) -> PricedOrder:
+        rows = self.order_rows
+        # the first row decides the quantity sign of all rows, see negate_quantities
+        if not (processed and processed.rows and rows) or rows[0] is not processed.rows[0]:
+            return self.processor.price(rows)
+        # processed rows are referenced by the cache, so their ids can't be reused meanwhile
+        positions = {id(row): position for position, row in enumerate(processed.rows)}
+        kept = [positions[id(row)] for row in rows if id(row) in positions]
+        new_rows = rows[len(kept):]
+        if any(id(row) in positions for row in new_rows):
+            return self.processor.price(rows)
+        priced = processed.priced.take(kept)
+        if new_rows:
+            new_priced = self.processor.price(rows[:1] + new_rows).take(
+                list(range(1, len(new_rows) + 1)))
+            priced = priced.append(replace(
+                new_priced, df=new_priced.df.assign(order_id=processed.df.iloc[0].order_id)))
+        return priced
+
+    def df_to_save(self) -> pd.DataFrame:
+        # cached rows keep the time they were priced at, saved rows have the time of saving
+        return self.df.pipe(self.processor.add_timestamp)
 
     def show(self) -> None:
         summary_col, removal_col = st.columns([4, 1])
@@ -64,7 +106,7 @@ class OrderSummary:
                 st.header("Order summary")
                 order_df = self.df[ORDER_SUMMARY_COLUMNS]
                 st.write(order_df.style.format(precision=2))
-                order_summary = utils.calculate_order_summary(order_df)
+                order_summary = utils.calculate_order_summary(order_df, self.processed.totals)
                 for key, value in order_summary.items():
                     st.write(f"{key}: {value}")
                 self.submitted = st.form_submit_button("Save order")
@@ -76,24 +118,30 @@ class OrderSummary:
             del self.order_rows[order_row_to_remove_index]
 
     def download_invoice(self):
-        df = self.df
+        # borb is imported with the first invoice, not on app start
+        from src.invoice.base import SELLER, InvoiceInfo, InvoiceType
+        from src.invoice.cache import invoice_cache
+        from src.invoice.vat import VATInvoice
+
+        processed = self.processed
+        df = processed.df
         invoice_info = InvoiceInfo(
             # TODO: probably need select box, because order type != invoice type
             invoice_type=InvoiceType.VAT,
             invoice_number=df.iloc[0].order_id,
             invoice_date=df.iloc[0].order_date,
             buyer=self.buyer,
-            seller=seller,
+            seller=SELLER,
             order_df=df,
+            totals=processed.totals,
         )
-        invoice = VATInvoice(invoice_info)
-        invoice.generate()
+        # rendered again only when something printed on the invoice changes
+        pdf = invoice_cache.render(VATInvoice, invoice_info)
         filename_args = [invoice_info.invoice_type.name, "invoice", invoice_info.invoice_date]
         invoice_filename = "_".join(filename_args) + ".pdf"
-        with open(INVOICE_PATH, "rb") as pdf:
-            st.download_button(
-                label="Download invoice pdf",
-                data=pdf.read(),
-                file_name=invoice_filename,
-                mime="application/octet-stream",
-            )
+        st.download_button(
+            label="Download invoice pdf",
+            data=pdf,
+            file_name=invoice_filename,
+            mime="application/octet-stream",
+        )
@@ -1,10 +1,13 @@
-from typing import Any, Dict, Type, Union
+from typing import Any, Dict, Optional, Type, Union
 from uuid import uuid1
 
 import pandas as pd
 import streamlit as st
 from src.config import COLUMN_NAME_SEPARATOR
+from src.database.loader import Loader
 from src.entities import Entity
+from src.entity_cache import entity_cache
+from src.pricing import OrderTotals
 
 
 def get_value_from_selectbox(values: pd.Series, default_value: str) -> str:
@@ -19,24 +22,39 @@ def get_entity_from_df(
     entity_identifier_column: str,
     entity_identifier: str,
 ) -> Entity:
-    required_columns = entity_type.attribute_list()
-    entity_df = df.loc[lambda x: x[entity_identifier_column] == entity_identifier, required_columns]
+    entity_df = df.loc[lambda x: x[entity_identifier_column] == entity_identifier]
     entity_dict = entity_df.to_dict("records")[0]
-    return entity_type(**entity_dict)
+    return entity_cache.from_record(entity_type, entity_dict)
+
+
+def get_entity_from_loader(
+    entity_type: Type[Entity],
+    dataloader: Loader,
+    table_name: str,
+    entity_identifier_column: str,
+    entity_identifier: str,
+) -> Entity:
+    """Same as get_entity_from_df for a loaded table, using the loader's hash lookup"""
+    entity_dict = dataloader.lookup(table_name, entity_identifier_column, entity_identifier)
+    if entity_dict is None:
+        raise IndexError(f"No {entity_identifier_column} {entity_identifier} in {table_name}")
+    return entity_cache.from_record(entity_type, entity_dict)
 
 
 def get_entity_from_selectbox(
     entity_type: Type[Entity],
-    df: pd.DataFrame,
+    dataloader: Loader,
+    table_name: str,
     entity_identifier_column: str,
     default_value: str = "",
 ) -> Union[Entity, None]:
-    values = df[entity_identifier_column]
+    values = dataloader.data[table_name][entity_identifier_column]
     entity_identifier = get_value_from_selectbox(values=values, default_value=default_value)
     if entity_identifier != default_value:
-        return get_entity_from_df(
+        return get_entity_from_loader(
             entity_type=entity_type,
-            df=df,
+            dataloader=dataloader,
+            table_name=table_name,
             entity_identifier_column=entity_identifier_column,
             entity_identifier=entity_identifier,
         )
@@ -52,11 +70,9 @@ def get_entity_identifier_column(entity_type: Type[Entity], identifier_type: str
     return COLUMN_NAME_SEPARATOR.join([entity_type.name(), identifier_type])
 
 
-def calculate_order_summary(order_df: pd.DataFrame) -> Dict[str, str]:
+def calculate_order_summary(order_df: pd.DataFrame, totals: OrderTotals) -> Dict[str, str]:
     return {
         "Order id": order_df.iloc[0].order_id,
         "Payment due": order_df.iloc[0].payment_due,
-        "Total sum EUR": str(round(order_df["sum"].sum(), 2)),
-        "VAT EUR": str(round(order_df["sum_vat"].sum() - order_df["sum"].sum(), 2)),
-        "Total sum with VAT EUR": str(round(order_df["sum_vat"].sum(), 2)),
+        **totals.to_dict(),
     }
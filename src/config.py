@@ -1,4 +1,6 @@
+import importlib.util
 import os
+import tempfile
 
 # Dates
 DATE_FORMAT: str = "%Y-%m-%d"  # Default date format
@@ -18,15 +20,45 @@ ORDER_TYPES = ['sale',
                'discount',
                'stock refill']
 
+# Invoice
+INVOICE_CACHE_SIZE = 64  # rendered invoice pdfs kept per process, by content
+INVOICE_BATCH_WORKERS = os.cpu_count() or 1  # processes rendering invoices in batch runs
+
 # Data loader
 SORT_COLUMN = "timestamp"
 ID_SUFFIX = "id"
 TABLE_FORMAT = "csv"
 ENTITY_NAME_COLUMN_SUFFIX = 'name'
 COLUMN_NAME_SEPARATOR = '_'
+INCREMENTAL_REFRESH = True  # refresh tables after save by fetching rows newer than last load
+USE_CURRENT_TABLES = False  # keep latest entity versions in <table>_current tables on write
+CURRENT_TABLE_SUFFIX = '_current'
+STOCK_LEDGER_TABLE = 'stock_balance'  # running stock balance per product
+LAZY_LOADING = True  # load tables when a page first needs them instead of on session start
+PRELOAD_WORKERS = 4  # tables loaded concurrently on startup, 1 loads them one by one
+PRELOAD_PRIORITY = [  # tables needed by the landing Order page are loaded first
+    'managertable',
+    'customertable',
+    'producttable',
+    'discounttable',
+    'inventorytable',
+    'orderstable',
+]
+FIRST_PAGE_TABLES = [  # eager preload waits for these only, the others load in the background
+    'managertable',
+    'customertable',
+    'producttable',
+    'discounttable',
+]
+ENTITY_CACHE_SIZE = 4096  # validated entities kept for reuse across reruns and sessions
 
 # Other
+# parquet exports and table snapshots need pyarrow, it is imported on first use
+HAS_PYARROW: bool = importlib.util.find_spec('pyarrow') is not None
 SEP: str = ";"  # column separator in csv files
+EXPORT_CHUNK_SIZE: int = 10_000  # rows read from sqlite and encoded at a time by data exports
+EXPORT_PATH: str = os.path.join(tempfile.gettempdir(), 'sandeliapp_exports')  # prepared exports
+EXPORT_MAX_AGE: float = 60 * 60.  # seconds a prepared export is kept for download
 
 # Main
 DATASOURCES = ['customer', 'product', 'manager', 'order']
@@ -37,3 +69,13 @@ DEFAULT_VALUE = 'default'
 # Database
 DATABASE = os.path.join(
     os.path.dirname(os.path.dirname(__file__)), os.sep.join(['database', 'sandeliapp.db']))
+SQLITE_POOL_SIZE: int = 8  # max open connections per database and process
+SQLITE_POOL_TIMEOUT: float = 10.  # seconds to wait for a free connection / lock
+SQLITE_CACHE_SIZE_KIB: int = 16 * 1024  # page cache per connection
+SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # bytes of db file memory mapped per connection
+SQLITE_STATEMENT_CACHE_SIZE: int = 256  # prepared statements kept per connection
+CHANGE_LOG_TABLE: str = 'table_changes'  # write counter per table, bumped by every export
+CHANGE_POLL_INTERVAL: float = 2.  # min seconds between change log reads per process
+SNAPSHOT_CACHE: bool = True  # keep loaded tables on disk, cold starts only read newer rows
+SNAPSHOT_PATH: str = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), os.sep.join(['database', 'snapshots']))
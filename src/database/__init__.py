@@ -1 +1 @@
-from .executor import SqlExecutor
+from .executor import ConnectionPool, SqlExecutor, get_pool
@@ -0,0 +1,297 @@
+from config.paths import DATABASE
+from src.config import (
+    CHANGE_POLL_INTERVAL,
+    HAS_PYARROW,
+    INCREMENTAL_REFRESH,
+    PRELOAD_PRIORITY,
+    PRELOAD_WORKERS,
+    SNAPSHOT_CACHE,
+)
+from src.database import queries
+from src.database.changes import ChangeLog
+from src.database.executor import SqlExecutor
+from src.database.snapshots import SnapshotStore
+from src.database.storage import ensure_table_storage
+from .tables import BaseTable
+
+import logging
+import threading
+import time
+import pandas as pd
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def read_only(df: pd.DataFrame) -> pd.DataFrame:
+    """Marks the arrays backing the frame read only, in place writes through the frame or any
+    shallow copy of it then raise instead of changing the shared data. Relies on the block
+    manager of pandas, run the tox pinned env after upgrading pandas"""
+    for array in df._mgr.arrays:
+        # categoricals and datetimes keep their values in a numpy array of their own
+        getattr(array, '_ndarray', array).flags.writeable = False
+    return df
+
+
+@dataclass(frozen=True)
+class TableSnapshot:
+    """Loaded table at one version. Frames are shared between sessions and never modified,
+    a refresh publishes a new snapshot instead, their arrays are read only"""
+    table: BaseTable
+    data: pd.DataFrame
+    version: int
+    # highest rowid loaded, None for tables without incremental refresh
+    watermark: Optional[int]
+    load_time: float
+    # change log counter of the source table read before loading, see ChangeLog
+    change_counter: int = 0
+    # value to first row position per looked up column, built on first lookup of the column
+    lookups: Dict[str, Dict[Any, int]] = field(default_factory=dict, repr=False, compare=False)
+    # structures computed from the frame, e.g. DiscountIndex, built once per version
+    derived: Dict[str, Any] = field(default_factory=dict, repr=False, compare=False)
+
+    def row_position(self, column: str, value: Any) -> Optional[int]:
+        if column not in self.lookups:
+            positions: Dict[Any, int] = {}
+            for position, key in enumerate(self.data[column].tolist()):
+                positions.setdefault(key, position)
+            self.lookups[column] = positions
+        return self.lookups[column].get(value)
+
+    def get_derived(self, key: str, build: Callable[[pd.DataFrame], Any]) -> Any:
+        if key not in self.derived:
+            self.derived[key] = build(self.data)
+        return self.derived[key]
+
+    def record(self, column: str, value: Any) -> Optional[Dict[str, Any]]:
+        """First row with the column equal to value, as a column to value dict"""
+        position = self.row_position(column, value)
+        if position is None:
+            return None
+        return self.data.iloc[[position]].to_dict('records')[0]
+
+
+class TableCache:
+    """Process-wide store of loaded tables, one copy of each table shared by all sessions.
+
+    Every publish of a table increments its version, so readers can tell whether the frame
+    they hold is still current by comparing version numbers.
+    """
+
+    def __init__(self, database: str = DATABASE, incremental: bool = INCREMENTAL_REFRESH,
+                 poll_interval: float = CHANGE_POLL_INTERVAL,
+                 snapshot_store: Optional[SnapshotStore] = None,
+                 use_snapshots: bool = SNAPSHOT_CACHE):
+        self.executor: SqlExecutor = SqlExecutor(database)
+        self.change_log: ChangeLog = ChangeLog(database)
+        # tables persisted on disk, read instead of a full load on first access
+        self.snapshot_store: Optional[SnapshotStore] = snapshot_store or (
+            SnapshotStore(database) if use_snapshots and HAS_PYARROW else None)
+        self.incremental = incremental
+        self.poll_interval = poll_interval
+        self._last_poll: float = 0.
+        self._snapshots: Dict[str, TableSnapshot] = {}
+        self._versions: Dict[str, int] = {}
+        # loads and refreshes of the same table are serialized, other tables are not blocked
+        self._table_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def _table_lock(self, name: str) -> threading.Lock:
+        with self._lock:
+            return self._table_locks.setdefault(name, threading.Lock())
+
+    def _publish(self, table: BaseTable, df: pd.DataFrame, watermark: Optional[int],
+                 load_time: float, change_counter: int) -> TableSnapshot:
+        with self._lock:
+            version = self._versions.get(table.name(), 0) + 1
+            self._versions[table.name()] = version
+            snapshot = TableSnapshot(
+                table, read_only(df), version, watermark, load_time, change_counter)
+            self._snapshots[table.name()] = snapshot
+        return snapshot
+
+    def _change_counter(self, table: BaseTable) -> int:
+        # read before the data, a write landing in between only causes one extra refresh
+        return self.change_log.counters().get(table.table_name, 0)
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._snapshots
+
+    def version(self, name: str) -> int:
+        """Version of the last published snapshot, 0 if the table was never loaded"""
+        return self._versions.get(name, 0)
+
+    def loaded_tables(self) -> List[str]:
+        return list(self._snapshots)
+
+    def get(self, table: BaseTable) -> TableSnapshot:
+        """Current snapshot of the table, loaded from the database on first access"""
+        snapshot = self._snapshots.get(table.name())
+        if snapshot is not None:
+            return snapshot
+        with self._table_lock(table.name()):
+            # another session may have loaded it while waiting for the lock
+            snapshot = self._snapshots.get(table.name())
+            if snapshot is None:
+                start = time.perf_counter()
+                change_counter = self._change_counter(table)
+                df, watermark = self.load_cold(table, change_counter)
+                snapshot = self._publish(
+                    table, df, watermark, time.perf_counter() - start, change_counter)
+        return snapshot
+
+    def load_many(self, tables: List[BaseTable], workers: int = PRELOAD_WORKERS,
+                  priority: List[str] = PRELOAD_PRIORITY) -> Dict[str, 'Future[TableSnapshot]']:
+        """Starts loading tables on a thread pool, each worker with its own pooled connection,
+        and returns their futures right away. Tables listed in priority are submitted first,
+        workers=1 loads them one by one in that order"""
+        tables = sorted(tables, key=lambda x: priority.index(x.name())
+                        if x.name() in priority else len(priority))
+        pool = ThreadPoolExecutor(max_workers=workers)
+        futures = {table.name(): pool.submit(self.get, table) for table in tables}
+        # submitted loads still run, callers wait only for the tables they need
+        pool.shutdown(wait=False)
+        return futures
+
+    def get_many(self, tables: List[BaseTable], workers: int = PRELOAD_WORKERS,
+                 priority: List[str] = PRELOAD_PRIORITY) -> Dict[str, TableSnapshot]:
+        """Loads tables concurrently and waits for all of them, see load_many"""
+        start = time.perf_counter()
+        snapshots = {
+            name: future.result()
+            for name, future in self.load_many(tables, workers, priority).items()
+        }
+        load_times = ', '.join(f'{name} {x.load_time:.3f}s' for name, x in snapshots.items())
+        logger.info('Loaded %s tables in %.3fs: %s',
+                    len(tables), time.perf_counter() - start, load_times)
+        return snapshots
+
+    def refresh(self, table: BaseTable, incremental: Optional[bool] = None) -> TableSnapshot:
+        """Reads the table changes from the database and publishes them as a new version"""
+        incremental = self.incremental if incremental is None else incremental
+        with self._table_lock(table.name()):
+            start = time.perf_counter()
+            change_counter = self._change_counter(table)
+            current = self._snapshots.get(table.name())
+            if incremental and current is not None and current.watermark is not None:
+                df, watermark = self.refresh_table(table, current)
+            else:
+                df, watermark = self.load_table_from_info(table)
+            return self._publish(
+                table, df, watermark, time.perf_counter() - start, change_counter)
+
+    def refresh_changed(self, force: bool = False) -> List[str]:
+        """Refreshes loaded tables written since they were loaded, by any session or process.
+        The change log is read at most once per poll interval, unless forced"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and now - self._last_poll < self.poll_interval:
+                return []
+            self._last_poll = now
+        counters = self.change_log.counters()
+        changed = [
+            snapshot.table for snapshot in list(self._snapshots.values())
+            if counters.get(snapshot.table.table_name, 0) != snapshot.change_counter
+        ]
+        for table in changed:
+            self.refresh(table)
+        return [table.name() for table in changed]
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Drops one or all tables, they are reloaded in full on next access"""
+        with self._lock:
+            for key in [name] if name is not None else list(self._snapshots):
+                if self._snapshots.pop(key, None) is not None:
+                    self._versions[key] += 1
+
+    def load_cold(self, table: BaseTable,
+                  change_counter: int) -> Tuple[pd.DataFrame, Optional[int]]:
+        """First load of the table in the process, from its stored snapshot plus rows written
+        since when the snapshot is usable, in full otherwise"""
+        if self.snapshot_store is None:
+            return self.load_table_from_info(table)
+        stored = self.snapshot_store.read(table)
+        # a higher counter than the database has means the snapshot is of another database file
+        if stored is not None and stored.change_counter <= change_counter:
+            # parquet keeps categoricals of string values only
+            stored_df = self.apply_dtypes(stored.data, table)
+            if stored.watermark is not None:
+                current = TableSnapshot(table, stored_df, 0, stored.watermark, 0.)
+                df, watermark = self.refresh_table(table, current)
+                # rows up to the stored watermark disappeared when it went down
+                if watermark is not None and watermark >= stored.watermark:
+                    changed = df is not stored_df
+                    logger.info('Loaded %s from snapshot%s',
+                                table.name(), ' and newer rows' if changed else '')
+                    if changed:
+                        self.write_snapshot(table, df, watermark, change_counter)
+                    return df, watermark
+            elif stored.change_counter == change_counter:
+                # without a watermark only an unchanged table can be read from its snapshot
+                logger.info('Loaded %s from snapshot', table.name())
+                return stored_df, None
+        df, watermark = self.load_table_from_info(table)
+        self.write_snapshot(table, df, watermark, change_counter)
+        return df, watermark
+
+    def write_snapshot(self, table: BaseTable, df: pd.DataFrame, watermark: Optional[int],
+                       change_counter: int) -> None:
+        try:
+            self.snapshot_store.write(table, df, watermark, change_counter)
+        except Exception:
+            # a missing snapshot only costs a full load on next start
+            logger.warning('Failed to store snapshot of %s', table.name(), exc_info=True)
+
+    def get_query(self, table: BaseTable) -> queries.LoaderQuery:
+        ensure_table_storage(table, self.executor.database)
+        return table.get_query()
+
+    def load_table_from_query(self, query: queries.LoaderQuery) -> pd.DataFrame:
+        with self.executor as executor:
+            return executor.read_df(query.get_query(), query.get_params())
+
+    def load_with_watermark(self, query: queries.LoaderQuery, sql: str,
+                            params: Tuple[Any, ...]) -> Tuple[pd.DataFrame, Optional[int]]:
+        watermark_query = query.get_watermark_query()
+        # data and watermark have to come from the same snapshot,
+        # otherwise rows committed in between would be merged twice
+        with self.executor as executor:
+            executor.cursor.execute('BEGIN')
+            df = executor.read_df(sql, params)
+            watermark = executor.cursor.execute(watermark_query).fetchone()[0]
+        return df, watermark
+
+    def load_table_from_info(self, table: BaseTable) -> Tuple[pd.DataFrame, Optional[int]]:
+        query = self.get_query(table)
+        if query.get_watermark_query() is None:
+            return self.apply_dtypes(self.load_table_from_query(query), table), None
+        df, watermark = self.load_with_watermark(query, query.get_query(), query.get_params())
+        return self.apply_dtypes(df, table), watermark
+
+    def refresh_table(self, table: BaseTable,
+                      current: TableSnapshot) -> Tuple[pd.DataFrame, Optional[int]]:
+        query = self.get_query(table)
+        delta_df, watermark = self.load_with_watermark(
+            query, query.get_delta_query(), query.get_delta_params(current.watermark))
+        if delta_df.shape[0] == 0:
+            return current.data, watermark
+        # merge builds a new frame, the published one stays untouched for its readers,
+        # concatenating categoricals with new values falls back to object, so dtypes are reapplied
+        return self.apply_dtypes(query.merge_delta(current.data, delta_df), table), watermark
+
+    @staticmethod
+    def apply_dtypes(df: pd.DataFrame, table: BaseTable) -> pd.DataFrame:
+        return df.astype({k: v for k, v in table.dtypes().items() if k in df.columns})
+
+
+_caches: Dict[str, TableCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_table_cache(database: str = DATABASE) -> TableCache:
+    with _caches_lock:
+        if database not in _caches:
+            _caches[database] = TableCache(database)
+        return _caches[database]
@@ -0,0 +1,45 @@
+from config.paths import DATABASE
+from src.config import CHANGE_LOG_TABLE
+from src.database.executor import SqlExecutor, ensure_once
+
+from typing import Dict, Iterable
+
+
+class ChangeLog:
+    """Write counter per table, bumped in the same transaction as the write itself.
+
+    Readers compare the counters with the ones seen when they loaded a table to learn whether
+    it changed since, which also covers writes made by other processes.
+    """
+
+    def __init__(self, database: str = DATABASE, table_name: str = CHANGE_LOG_TABLE):
+        self.database = database
+        self.table_name = table_name
+
+    def ensure(self) -> None:
+        ensure_once(('change_log', self.database, self.table_name), self.create)
+
+    def create(self) -> None:
+        with SqlExecutor(self.database) as executor:
+            executor.cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {self.table_name} (
+                    table_name TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL
+                )
+            """)
+
+    def record(self, table_names: Iterable[str], executor: SqlExecutor) -> None:
+        """Bumps the counters of written tables, has to run inside the write transaction"""
+        executor.cursor.executemany(
+            f"""INSERT INTO {self.table_name} (table_name, version) VALUES (?, 1)
+                ON CONFLICT (table_name) DO UPDATE SET version = version + 1""",
+            [(table_name,) for table_name in sorted(set(table_names))],
+        )
+
+    def counters(self) -> Dict[str, int]:
+        """Current counter per written table, tables never written are missing"""
+        self.ensure()
+        with SqlExecutor(self.database) as executor:
+            rows = executor.cursor.execute(
+                f"SELECT table_name, version FROM {self.table_name}").fetchall()
+        return dict(rows)
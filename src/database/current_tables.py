@@ -0,0 +1,56 @@
+from src.database.executor import SqlExecutor, ensure_once
+from src.database import queries
+from .tables import BaseTable
+
+import pandas as pd
+
+
+def ensure_current_table(table: BaseTable, database: str) -> None:
+    """Creates and fills the current table from history, unless it already exists.
+    Checked once per process"""
+    ensure_once(('current_table', database, table.table_name),
+                lambda: create_current_table(table, database))
+
+
+def create_current_table(table: BaseTable, database: str) -> None:
+    current_table = table.current_table_name
+    with SqlExecutor(database) as executor:
+        exists = executor.cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (current_table,)
+        ).fetchone()
+        if not exists:
+            executor.cursor.execute(
+                f"CREATE TABLE {current_table} AS SELECT * FROM {table.table_name} WHERE 0")
+            executor.cursor.execute(
+                f"CREATE UNIQUE INDEX {current_table}_key "
+                f"ON {current_table} ({','.join(table.groupby_columns)})")
+            executor.invalidate_schema_cache(current_table)
+            rebuild_current_table(table, executor)
+
+
+def rebuild_current_table(table: BaseTable, executor: SqlExecutor) -> None:
+    """Replaces current table content with the latest version of every entity in history"""
+    columns = ','.join(executor.get_table_columns(table.table_name))
+    latest_rows = queries.LatestRowQuery(
+        table_name=table.table_name,
+        groupby_columns=table.groupby_columns,
+        sort_column=table.sort_column,
+    ).get_query()
+    current_table = table.current_table_name
+    executor.cursor.execute(f"DELETE FROM {current_table}")
+    executor.cursor.execute(
+        f"INSERT INTO {current_table} ({columns}) SELECT {columns} FROM ({latest_rows})")
+
+
+def upsert_current_rows(df: pd.DataFrame, table: BaseTable, executor: SqlExecutor) -> None:
+    """Writes new entity versions to the current table, skipping rows older than stored ones"""
+    current_table = table.current_table_name
+    columns = df.columns.tolist()
+    updates = ','.join(f'{column} = excluded.{column}' for column in columns)
+    sql = f"""
+        INSERT INTO {current_table} ({','.join(columns)})
+        VALUES ({','.join('?' * len(columns))})
+        ON CONFLICT ({','.join(table.groupby_columns)}) DO UPDATE SET {updates}
+        WHERE excluded.{table.sort_column} >= {current_table}.{table.sort_column}
+    """
+    executor.executemany_df(sql, df)
@@ -1,19 +1,200 @@
 from config.paths import DATABASE
+from src.config import (
+    SQLITE_CACHE_SIZE_KIB,
+    SQLITE_MMAP_SIZE,
+    SQLITE_POOL_SIZE,
+    SQLITE_POOL_TIMEOUT,
+    SQLITE_STATEMENT_CACHE_SIZE,
+)
+
 import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from queue import Empty, Queue
 from traceback import print_exception
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, TypeVar
+
+import pandas as pd
+
+
+# Applied once per connection, when the pool opens it
+CONNECTION_PRAGMAS: List[str] = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KIB}",
+    f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}",
+]
+
+
+@dataclass
+class PoolStats:
+    checkouts: int = 0
+    wait_time: float = 0.
+    open_connections: int = 0
+
+
+class ConnectionPool:
+    """Process-wide pool of long-lived sqlite connections to a single database.
+
+    Connections are opened lazily up to `max_connections`, configured once with
+    CONNECTION_PRAGMAS and handed out to one thread at a time.
+    """
+
+    def __init__(self, database: str,
+                 max_connections: int = SQLITE_POOL_SIZE,
+                 timeout: float = SQLITE_POOL_TIMEOUT):
+        self.database = database
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.stats = PoolStats()
+        self._idle: Queue = Queue()
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.database, timeout=self.timeout,
+                                     check_same_thread=False,
+                                     cached_statements=SQLITE_STATEMENT_CACHE_SIZE)
+        for pragma in CONNECTION_PRAGMAS:
+            connection.execute(pragma)
+        return connection
+
+    def _reserve_slot(self) -> bool:
+        with self._lock:
+            if self.stats.open_connections < self.max_connections:
+                self.stats.open_connections += 1
+                return True
+            return False
+
+    def acquire(self) -> sqlite3.Connection:
+        start = time.perf_counter()
+        try:
+            connection = self._idle.get_nowait()
+        except Empty:
+            if self._reserve_slot():
+                try:
+                    connection = self._connect()
+                except sqlite3.Error:
+                    with self._lock:
+                        self.stats.open_connections -= 1
+                    raise
+            else:
+                try:
+                    connection = self._idle.get(timeout=self.timeout)
+                except Empty:
+                    raise TimeoutError(
+                        f"No free connection to {self.database} after {self.timeout}s")
+        with self._lock:
+            self.stats.checkouts += 1
+            self.stats.wait_time += time.perf_counter() - start
+        return connection
+
+    def release(self, connection: sqlite3.Connection) -> None:
+        self._idle.put(connection)
+
+    def close(self) -> None:
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except Empty:
+                break
+            connection.close()
+            with self._lock:
+                self.stats.open_connections -= 1
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(database: str = DATABASE) -> ConnectionPool:
+    with _pools_lock:
+        if database not in _pools:
+            _pools[database] = ConnectionPool(database)
+        return _pools[database]
+
+
+T = TypeVar("T")
+
+# keys of setup steps already run in this process, e.g. ("ledger", database, table name)
+_ensured: Set[Tuple[str, ...]] = set()
+_ensure_locks: Dict[Tuple[str, ...], threading.Lock] = {}
+_ensure_locks_lock = threading.Lock()
+
+
+def ensure_once(key: Tuple[str, ...], setup: Callable[[], T]) -> Optional[T]:
+    """Runs setup the first time key is seen in this process and returns its result, None
+    afterwards. Callers of the same key wait for the first one, other keys are not blocked,
+    a failed setup is run again by the next caller"""
+    if key in _ensured:
+        return None
+    with _ensure_locks_lock:
+        lock = _ensure_locks.setdefault(key, threading.Lock())
+    with lock:
+        if key in _ensured:
+            return None
+        result = setup()
+        _ensured.add(key)
+        return result
+
+
+# column names per (database, table), read with PRAGMA table_info
+_schema_cache: Dict[Tuple[str, str], List[str]] = {}
 
 
 class SqlExecutor:
 
     def __init__(self, database: str = DATABASE):
         self.database = database
+        self.pool: ConnectionPool = get_pool(database)
+        # checked out connection is kept per thread, so one executor can serve concurrent workers
+        self._local = threading.local()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        return self._local.connection
+
+    @property
+    def cursor(self) -> sqlite3.Cursor:
+        return self._local.cursor
 
     def __enter__(self):
-        self.connection: sqlite3.Connection = sqlite3.connect(self.database)
-        self.cursor: sqlite3.Cursor = self.connection.cursor()
+        self._local.connection = self.pool.acquire()
+        self._local.cursor = self._local.connection.cursor()
         return self
 
     def __exit__(self, exception_type, exception_value, traceback):
         if exception_type is not None:
             print_exception(exception_type, exception_value, traceback)
-        self.connection.close()
+            self.connection.rollback()
+        else:
+            self.connection.commit()
+        self.cursor.close()
+        self.pool.release(self.connection)
+
+    def get_table_columns(self, table_name: str) -> List[str]:
+        key = (self.database, table_name)
+        if key not in _schema_cache:
+            rows = self.cursor.execute(f"PRAGMA table_info({table_name})").fetchall()
+            if not rows:
+                raise sqlite3.OperationalError(f"no such table: {table_name}")
+            _schema_cache[key] = [row[1] for row in rows]
+        return _schema_cache[key]
+
+    def invalidate_schema_cache(self, table_name: Optional[str] = None) -> None:
+        """Has to be called after schema migrations, drops cached columns of one or all tables"""
+        for key in list(_schema_cache):
+            if key[0] == self.database and table_name in (None, key[1]):
+                del _schema_cache[key]
+
+    def read_df(self, sql: str, params: Sequence[Any] = ()) -> pd.DataFrame:
+        # the statement is looked up in the connection's cache by its text,
+        # so bound parameters let repeated queries skip parsing and planning
+        cursor = self.cursor.execute(sql, params)
+        columns = [description[0] for description in cursor.description]
+        return pd.DataFrame.from_records(cursor.fetchall(), columns=columns)
+
+    def executemany_df(self, sql: str, df: pd.DataFrame) -> None:
+        # python objects with None for missing values, numpy scalars can't be bound by sqlite3
+        rows = df.astype(object).where(df.notnull(), None).values.tolist()
+        self.cursor.executemany(sql, rows)
@@ -1,22 +1,75 @@
+from config.paths import DATABASE
+from src.database.changes import ChangeLog
+from src.database.current_tables import ensure_current_table, upsert_current_rows
 from src.database.executor import SqlExecutor
+from src.database.stock_ledger import StockLedger
 from src.database.tables import BaseTable
 
+import threading
+import time
 import pandas as pd
-from typing import List
+from dataclasses import dataclass
+from typing import List, Tuple
+
+
+@dataclass
+class ExportStats:
+    rows: int = 0
+    seconds: float = 0.
+    transactions: int = 0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.
 
 
 class Exporter:
 
-    def __init__(self):
-        self.executor: SqlExecutor = SqlExecutor()
+    # shared by all exporters in the process
+    stats: ExportStats = ExportStats()
+    _stats_lock = threading.Lock()
+
+    def __init__(self, database: str = DATABASE):
+        self.executor: SqlExecutor = SqlExecutor(database)
+        self.stock_ledger: StockLedger = StockLedger(database=self.executor.database)
+        self.change_log: ChangeLog = ChangeLog(self.executor.database)
 
     def append_df_to_database(self, df: pd.DataFrame, table: BaseTable) -> None:
+        self.append_dfs_to_database([(df, table)])
+
+    def append_dfs_to_database(self, writes: List[Tuple[pd.DataFrame, BaseTable]]) -> None:
+        """Appends each frame to its table in a single transaction, all or nothing"""
+        for _, table in writes:
+            if table.reads_current_table:
+                ensure_current_table(table, self.executor.database)
+            if self.stock_ledger.tracks(table):
+                self.stock_ledger.ensure()
+        self.change_log.ensure()
+        start = time.perf_counter()
         with self.executor as executor:
-            columns_to_select = self.get_table_columns(table, executor)
-            df[columns_to_select] \
-                .to_sql(name=table.table_name, con=executor.connection,
-                        index=False, if_exists='append')
+            executor.cursor.execute('BEGIN IMMEDIATE')
+            rows = sum(self.write_table(df, table, executor) for df, table in writes)
+            self.change_log.record([table.table_name for _, table in writes], executor)
+        with self._stats_lock:
+            self.stats.rows += rows
+            self.stats.seconds += time.perf_counter() - start
+            self.stats.transactions += 1
+
+    def write_table(self, df: pd.DataFrame, table: BaseTable, executor: SqlExecutor) -> int:
+        columns = self.get_table_columns(table, executor)
+        table_df = df[columns]
+        # derived tables are kept in sync within the same transaction
+        if table.reads_current_table:
+            upsert_current_rows(table_df, table, executor)
+        if self.stock_ledger.tracks(table):
+            self.stock_ledger.apply(table_df, executor)
+        column_list = ','.join(f'"{column}"' for column in columns)
+        sql = f"""
+            INSERT INTO {table.table_name} ({column_list})
+            VALUES ({','.join('?' * len(columns))})
+        """
+        executor.executemany_df(sql, table_df)
+        return table_df.shape[0]
 
     def get_table_columns(self, table: BaseTable, executor: SqlExecutor) -> List[str]:
-        sql = f"""SELECT * FROM {table.table_name} LIMIT 1"""
-        return pd.read_sql(sql, con=executor.connection).columns.tolist()
+        return executor.get_table_columns(table.table_name)
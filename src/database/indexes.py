@@ -0,0 +1,134 @@
+from config.paths import DATABASE
+from src.database import queries
+from src.database.executor import SqlExecutor, ensure_once
+from src.database.storage import ensure_table_storage
+from .tables import BaseTable
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Set
+
+
+# sqlite query plan steps that read a whole table without an index or sort it in a temporary
+# b-tree, scans of CTEs and subqueries are ignored since they only read intermediate results
+FULL_SCAN_PATTERN = re.compile(r"^SCAN (?!cte\b|\(subquery)(?!.*\bINDEX\b)|USE TEMP B-TREE")
+
+
+@dataclass
+class IndexDefinition:
+    table_name: str
+    columns: List[str]
+    unique: bool = False
+
+    @property
+    def name(self) -> str:
+        column_names = [column.split()[0] for column in self.columns]
+        return '_'.join(['ix', self.table_name] + column_names)
+
+    def get_create_query(self) -> str:
+        unique = 'UNIQUE ' if self.unique else ''
+        return f"""
+            CREATE {unique}INDEX IF NOT EXISTS {self.name}
+            ON {self.table_name} ({','.join(self.columns)})
+        """
+
+
+def derive_indexes(table: BaseTable) -> List[IndexDefinition]:
+    """Indexes serving the loader queries declared by a table definition"""
+    query = table.get_query()
+    indexes = []
+    # incremental refreshes read rows by rowid, which needs no index
+    if isinstance(query, queries.CurrentRowQuery):
+        # unique key on groupby columns is created together with the current table
+        indexes.append(IndexDefinition(
+            query.history_table, query.groupby_columns + [f'{query.sort_column} DESC']))
+    elif isinstance(query, queries.LatestRowQuery):
+        indexes.append(IndexDefinition(
+            query.table_name, query.groupby_columns + [f'{query.sort_column} DESC']))
+    elif isinstance(query, queries.StockLedgerQuery):
+        # balances are read from the ledger, newer source rows by rowid
+        indexes.append(IndexDefinition(query.ledger_table, [f'{query.sum_column} DESC']))
+        indexes.append(IndexDefinition(query.ledger_table, [query.sort_column]))
+    elif isinstance(query, queries.GroupedSumQuery):
+        # covering index, the sum is computed from the index alone
+        indexes.append(IndexDefinition(
+            query.table_name, query.groupby_columns + [query.column_to_sum]))
+    elif isinstance(query, queries.ValidDateQuery):
+        indexes.append(IndexDefinition(
+            query.table_name, [query.start_date_column, query.end_date_column]))
+    return indexes
+
+
+class IndexManager:
+
+    def __init__(self, tables: List[BaseTable], database: str = DATABASE):
+        self.tables = tables
+        self.executor: SqlExecutor = SqlExecutor(database)
+
+    def index_definitions(self) -> List[IndexDefinition]:
+        definitions: Dict[str, IndexDefinition] = {}
+        for table in self.tables:
+            for index in derive_indexes(table):
+                definitions[index.name] = index
+        return list(definitions.values())
+
+    def existing_indexes(self, executor: SqlExecutor) -> Set[str]:
+        rows = executor.cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()
+        return {row[0] for row in rows}
+
+    def ensure_indexes(self) -> List[str]:
+        """Creates missing indexes and refreshes planner statistics, returns created index names"""
+        for table in self.tables:
+            ensure_table_storage(table, self.executor.database)
+        with self.executor as executor:
+            existing = self.existing_indexes(executor)
+            created = []
+            for index in self.index_definitions():
+                if index.name not in existing:
+                    executor.cursor.execute(index.get_create_query())
+                    created.append(index.name)
+            executor.cursor.execute("ANALYZE")
+        return created
+
+    def report_full_scans(self) -> Dict[str, List[str]]:
+        """Query plan steps of loader queries that still scan or sort whole tables, per table"""
+        report = {}
+        for table in self.tables:
+            query = table.get_query()
+            steps = query.explain(self.executor)
+            if query.get_watermark_query() is not None:
+                steps += query.explain(self.executor, watermark=0)
+            full_scans = [step for step in steps if FULL_SCAN_PATTERN.search(step)]
+            if full_scans:
+                report[table.name()] = full_scans
+        return report
+
+
+def ensure_indexes(tables: List[BaseTable], database: str = DATABASE) -> List[str]:
+    """Runs IndexManager.ensure_indexes once per process and database"""
+    return ensure_once(
+        ('indexes', database), IndexManager(tables, database).ensure_indexes) or []
+
+
+if __name__ == "__main__":
+    from src.database.tables import (
+        CustomerTable,
+        DiscountTable,
+        InventoryTable,
+        ManagerTable,
+        OrdersTable,
+        ProductTable,
+    )
+
+    manager = IndexManager([
+        ManagerTable(),
+        CustomerTable(),
+        ProductTable(),
+        DiscountTable(),
+        InventoryTable(),
+        OrdersTable(),
+    ])
+    print("Created indexes:", manager.ensure_indexes())
+    for table_name, steps in manager.report_full_scans().items():
+        print(f"{table_name}: {'; '.join(steps)}")
@@ -1,40 +1,137 @@
-from collections import defaultdict
+from .cache import TableCache, TableSnapshot, get_table_cache
 from .executor import SqlExecutor
-from src.database import queries
+from src.config import FIRST_PAGE_TABLES, LAZY_LOADING, PRELOAD_PRIORITY, PRELOAD_WORKERS
 from .tables import BaseTable
 
-import streamlit as st
+import logging
+import time
 import pandas as pd
-from typing import List, Dict
+from collections.abc import Mapping
+from concurrent.futures import as_completed
+from typing import Any, Callable, Iterator, List, Dict, Optional, Type
+
+logger = logging.getLogger(__name__)
+
+
+class TableData(Mapping):
+    """Table name to DataFrame view of the shared cache, loading registered tables on first access.
+    Each access returns a shallow copy of the shared frame: columns can be added, dropped or
+    reordered without other sessions seeing it, in place writes to values raise"""
+
+    def __init__(self, loader: 'Loader'):
+        self.loader = loader
+
+    def __getitem__(self, name: str) -> pd.DataFrame:
+        if name not in self.loader.table_info:
+            raise KeyError(name)
+        return self.loader.snapshot(name).data.copy(deep=False)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.loader.table_info and self.loader.cache.is_loaded(name)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([name for name in self.loader.table_info if name in self])
+
+    def __len__(self) -> int:
+        return len(list(iter(self)))
 
 
 class Loader:
+    """Per-session view of the process-wide TableCache"""
+
+    def __init__(self, cache: Optional[TableCache] = None):
+        self.cache: TableCache = cache or get_table_cache()
+        self.executor: SqlExecutor = self.cache.executor
+        self.table_info: Dict[str, BaseTable] = {}
+        self.data: Mapping = TableData(self)
+        # cache version of each table last handed out to this session
+        self.versions: Dict[str, int] = {}
+        self.created: float = time.perf_counter()
+        # seconds from session start until the tables of the first page were loaded
+        self.time_to_first_render: Optional[float] = None
+
+    def snapshot(self, name: str) -> TableSnapshot:
+        snapshot = self.cache.get(self.table_info[name])
+        self.versions[name] = snapshot.version
+        return snapshot
 
-    def __init__(self):
-        self.executor: SqlExecutor = SqlExecutor()
-        self.table_info: Dict[str, BaseTable] = defaultdict()
-        self.data: Dict[str, pd.DataFrame] = defaultdict()
+    def lookup(self, name: str, column: str, value: Any) -> Optional[Dict[str, Any]]:
+        """Row of a registered table by column value, in constant time after the first lookup
+        of the column in the current table version"""
+        return self.snapshot(name).record(column, value)
 
-    def load_table_from_query(self, query: queries.LoaderQuery) -> pd.DataFrame:
-        with self.executor as executor:
-            return pd.read_sql(query.get_query(), con=executor.connection)
+    def derived(self, name: str, key: str, build: Callable[[pd.DataFrame], Any]) -> Any:
+        """Structure built from a registered table by build, shared by all sessions reading
+        the same table version"""
+        return self.snapshot(name).get_derived(key, build)
 
-    def load_table_from_info(self, table: BaseTable) -> pd.DataFrame:
-        query = getattr(queries, table.query)(**table.argument_dict())
-        return self.load_table_from_query(query)
+    @property
+    def load_times(self) -> Dict[str, float]:
+        """Seconds spent on the last load or refresh of each loaded table"""
+        return {name: self.cache.get(self.table_info[name]).load_time for name in self.data}
 
-    def load_data_dict(self, tables: List[BaseTable]) -> None:
+    def load_data_dict(self, tables: List[BaseTable], workers: int = PRELOAD_WORKERS,
+                       priority: List[str] = PRELOAD_PRIORITY,
+                       wait_for: Optional[List[str]] = None,
+                       progress: Optional[Callable[[List[str]], None]] = None) -> None:
+        """Loads tables not in the shared cache yet concurrently, see TableCache.load_many.
+        Returns as soon as the tables named in wait_for are loaded, all tables when None,
+        the others keep loading in the background. progress is called with the names of
+        tables still waited for before each wait"""
+        self.register(tables)
+        futures = self.cache.load_many(tables, workers=workers, priority=priority)
+        pending = [name for name in futures if wait_for is None or name in wait_for]
+        if progress is not None and pending:
+            progress(list(pending))
+        for future in as_completed([futures[name] for name in pending]):
+            snapshot = future.result()
+            self.versions[snapshot.table.name()] = snapshot.version
+            pending.remove(snapshot.table.name())
+            logger.info('Loaded %s in %.3fs', snapshot.table.name(), snapshot.load_time)
+            if progress is not None and pending:
+                progress(list(pending))
+
+    def register(self, tables: List[BaseTable]) -> None:
+        """Makes tables available for loading on first access to Loader.data"""
         for table in tables:
             self.table_info[table.name()] = table
-            self.data[table.name()] = self.load_table_from_info(table)
 
-    def update(self, table: BaseTable) -> None:
+    def ensure_loaded(self, tables: List[Type[BaseTable]],
+                      wait_for: Optional[List[Type[BaseTable]]] = None,
+                      progress: Optional[Callable[[List[str]], None]] = None) -> None:
+        """Loads the registered tables not loaded yet, concurrently, and returns once the
+        tables in wait_for are loaded, all when None. The first call marks the first render"""
+        missing = [
+            self.table_info[table.name()] for table in tables if table.name() not in self.data
+        ]
+        if missing:
+            self.load_data_dict(
+                missing, wait_for=None if wait_for is None else [x.name() for x in wait_for],
+                progress=progress)
+        if self.time_to_first_render is None:
+            self.time_to_first_render = time.perf_counter() - self.created
+            logger.info('First page tables ready %.3fs after session start',
+                        self.time_to_first_render)
+
+    def refresh_changed(self) -> List[str]:
+        """Names of tables with a newer version than this session last read, tables written
+        elsewhere are refreshed in the shared cache first"""
+        self.cache.refresh_changed()
+        return [
+            name for name, version in self.versions.items() if self.cache.version(name) != version
+        ]
+
+    def update(self, table: BaseTable, incremental: Optional[bool] = None) -> None:
+        """Publishes the table changes to the shared cache, for all sessions"""
         self.table_info[table.name()] = table
-        self.data[table.name()] = self.load_table_from_info(table)
+        self.versions[table.name()] = self.cache.refresh(table, incremental).version
 
 
-@st.cache(allow_output_mutation=True)
-def preload_data(tables: List[BaseTable]) -> Loader:
+def preload_data(tables: List[BaseTable], lazy: bool = LAZY_LOADING) -> Loader:
+    """Creates a session loader, tables are shared with other sessions through the table cache"""
     loader = Loader()
-    loader.load_data_dict(tables=tables)
+    if lazy:
+        loader.register(tables)
+    else:
+        loader.load_data_dict(tables=tables, wait_for=FIRST_PAGE_TABLES)
     return loader
@@ -1,13 +1,24 @@
 from abc import ABC, abstractmethod
+from dataclasses import field
 from datetime import date
 from pydantic.dataclasses import dataclass
-from typing import List
+from typing import Any, List, Optional, Tuple
 
-from src.config import DATE_FORMAT
+import pandas as pd
+
+from src.config import DATE_FORMAT, SORT_COLUMN, STOCK_LEDGER_TABLE
+from src.database.executor import SqlExecutor
+
+# Incremental refresh reads rows by rowid. Writes are serialized by sqlite and rowids only grow
+# as rows are appended, so a row committed after a load always has a higher rowid than the
+# watermark read with it, whatever timestamp the app gave it before the write.
+WATERMARK_COLUMN = 'rowid'
 
 
 @dataclass
 class LoaderQuery(ABC):
+    """SQL with values bound as ? parameters, so the statement text stays the same
+    across calls and is served from the connection's prepared statement cache"""
 
     table_name: str
 
@@ -15,14 +26,49 @@ class LoaderQuery(ABC):
     def get_query(self) -> str:
         ...
 
+    def get_params(self) -> Tuple[Any, ...]:
+        return ()
+
+    def get_watermark_query(self) -> Optional[str]:
+        """Query returning the highest rowid read, None when incremental refresh is not supported"""
+        return None
+
+    def get_delta_query(self) -> str:
+        raise NotImplementedError(f'{type(self).__name__} does not support incremental refresh')
+
+    def get_delta_params(self, watermark: int) -> Tuple[Any, ...]:
+        return self.get_params() + (watermark,)
+
+    def explain(self, executor: Optional[SqlExecutor] = None,
+                watermark: Optional[int] = None) -> List[str]:
+        """EXPLAIN QUERY PLAN steps of the query, or of the delta query when watermark is given"""
+        if watermark is None:
+            sql, params = self.get_query(), self.get_params()
+        else:
+            sql, params = self.get_delta_query(), self.get_delta_params(watermark)
+        with executor or SqlExecutor() as executor:
+            rows = executor.cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()
+        return [row[-1] for row in rows]
+
+    def merge_delta(self, df: pd.DataFrame, delta_df: pd.DataFrame) -> pd.DataFrame:
+        raise NotImplementedError(f'{type(self).__name__} does not support incremental refresh')
+
 
 @dataclass
 class LatestRowQuery(LoaderQuery):
 
     groupby_columns: List[str]
     sort_column: str
+    columns: List[str] = field(default_factory=list)  # all columns when empty
 
-    def get_query(self) -> str:
+    @property
+    def select_columns(self) -> str:
+        return ','.join(self.columns) or '*'
+
+    def get_query(self, where: str = '') -> str:
+        return self.latest_rows_query(self.table_name, where)
+
+    def latest_rows_query(self, table_name: str, where: str = '') -> str:
         return f"""
             WITH cte AS (
                 SELECT
@@ -32,36 +78,113 @@ class LatestRowQuery(LoaderQuery):
                         ORDER BY {self.sort_column} DESC
                     ) as row_num
                 FROM
-                    {self.table_name} as tbl
+                    {table_name} as tbl
+                {where}
             )
 
             SELECT
-                *
+                {self.select_columns}
             FROM
                 cte
             WHERE
                 row_num = 1
         """
 
+    def get_watermark_query(self) -> Optional[str]:
+        return f"SELECT COALESCE(MAX({WATERMARK_COLUMN}), 0) FROM {self.table_name}"
+
+    def get_delta_query(self) -> str:
+        return self.get_query(where=f"WHERE {WATERMARK_COLUMN} > ?")
+
+    def merge_delta(self, df: pd.DataFrame, delta_df: pd.DataFrame) -> pd.DataFrame:
+        # rows written late can carry an older sort value than the cached version, so the latest
+        # row per group is picked by sort value, delta rows win ties, cached row order is kept
+        combined = pd.concat([df, delta_df], ignore_index=True)
+        latest = combined \
+            .sort_values(self.sort_column, kind='mergesort') \
+            .drop_duplicates(subset=self.groupby_columns, keep='last')
+        return combined.loc[latest.index.sort_values()].reset_index(drop=True)
+
+
+@dataclass
+class CurrentRowQuery(LatestRowQuery):
+    """Plain read of a current table, which already holds only the latest row per group.
+    Upserts keep rowids of current rows, so newer rows are read from the history table"""
+
+    history_table: str = ''
+
+    def get_query(self, where: str = '') -> str:
+        return f"""
+            SELECT
+                {self.select_columns}
+            FROM {self.table_name}
+            {where}
+        """
+
+    def get_watermark_query(self) -> Optional[str]:
+        return f"SELECT COALESCE(MAX({WATERMARK_COLUMN}), 0) FROM {self.history_table}"
+
+    def get_delta_query(self) -> str:
+        return self.latest_rows_query(self.history_table, where=f"WHERE {WATERMARK_COLUMN} > ?")
+
 
 @dataclass
 class GroupedSumQuery(LoaderQuery):
 
     groupby_columns: List[str]
     column_to_sum: str
+    sort_column: str = SORT_COLUMN
 
-    def get_query(self) -> str:
+    @property
+    def sum_column(self) -> str:
+        return f'sum_{self.column_to_sum}'
+
+    def get_query(self, where: str = '') -> str:
         groupby_columns = ','.join(self.groupby_columns)
-        sum_column = f'sum_{self.column_to_sum}'
         return f"""
             SELECT
                 {groupby_columns},
-                SUM({self.column_to_sum}) as {sum_column}
+                SUM({self.column_to_sum}) as {self.sum_column}
             FROM {self.table_name}
+            {where}
             GROUP BY {groupby_columns}
-            ORDER BY {sum_column} DESC
+            ORDER BY {self.sum_column} DESC
+    """
+
+    def get_watermark_query(self) -> Optional[str]:
+        return f"SELECT COALESCE(MAX({WATERMARK_COLUMN}), 0) FROM {self.table_name}"
+
+    def get_delta_query(self) -> str:
+        return self.get_query(where=f"WHERE {WATERMARK_COLUMN} > ?")
+
+    def merge_delta(self, df: pd.DataFrame, delta_df: pd.DataFrame) -> pd.DataFrame:
+        return pd.concat([df, delta_df]) \
+            .groupby(self.groupby_columns, as_index=False)[self.sum_column].sum() \
+            .sort_values(self.sum_column, ascending=False) \
+            .reset_index(drop=True)
+
+
+@dataclass
+class StockLedgerQuery(GroupedSumQuery):
+    """Reads balances from a ledger table holding the running sum per group, see stock_ledger.
+    The ledger is written in the same transaction as the source table, so the source rowid is
+    the watermark and newer source rows are summed and added like in GroupedSumQuery"""
+
+    ledger_table: str = STOCK_LEDGER_TABLE
+
+    def get_query(self, where: str = '') -> str:
+        return f"""
+            SELECT
+                {','.join(self.groupby_columns)},
+                {self.sum_column}
+            FROM {self.ledger_table}
+            {where}
+            ORDER BY {self.sum_column} DESC
     """
 
+    def get_delta_query(self) -> str:
+        return GroupedSumQuery.get_query(self, where=f"WHERE {WATERMARK_COLUMN} > ?")
+
 
 @dataclass
 class ValidDateQuery(LoaderQuery):
@@ -70,6 +193,7 @@ class ValidDateQuery(LoaderQuery):
     start_date_column: str
     end_date_column: str
     date_format: str = DATE_FORMAT
+    columns: List[str] = field(default_factory=list)  # all columns when empty
 
     def __post_init__(self):
         self.filter_date = self.filter_date.strftime(self.date_format)
@@ -77,9 +201,12 @@ class ValidDateQuery(LoaderQuery):
     def get_query(self) -> str:
         return f"""
             SELECT
-                *
+                {','.join(self.columns) or '*'}
             FROM {self.table_name}
             WHERE
-                {self.start_date_column} <= '{self.filter_date}'
-                AND {self.end_date_column} >= '{self.filter_date}'
+                {self.start_date_column} <= ?
+                AND {self.end_date_column} >= ?
     """
+
+    def get_params(self) -> Tuple[Any, ...]:
+        return (self.filter_date, self.filter_date)
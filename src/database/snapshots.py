@@ -0,0 +1,107 @@
+from config.paths import DATABASE
+from src.config import SNAPSHOT_PATH
+from .tables import BaseTable
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# bumped when the stored layout changes, older snapshots are then ignored
+SNAPSHOT_FORMAT_VERSION = 2
+METADATA_KEY = b'sandeliapp_snapshot'
+
+
+@dataclass
+class StoredSnapshot:
+    data: pd.DataFrame
+    # watermark and change log counter of the table when the snapshot was taken
+    watermark: Optional[int]
+    change_counter: int
+
+
+class SnapshotStore:
+    """Loaded tables persisted to disk with their watermark, read back on cold start.
+
+    A snapshot is stored as parquet, one file per table, replaced atomically, in a directory
+    of its database file. Snapshots of a different query, columns or dtypes than the table
+    currently has are ignored. pyarrow is imported when a snapshot is first used.
+    """
+
+    def __init__(self, database: str = DATABASE, path: str = SNAPSHOT_PATH):
+        self.path = os.path.join(path, self.directory_name(database))
+
+    @staticmethod
+    def directory_name(database: str) -> str:
+        """Database file name and a hash of its absolute path, databases of the same name in
+        other folders don't share snapshots"""
+        database_path = os.path.realpath(database)
+        database_name = os.path.splitext(os.path.basename(database_path))[0]
+        path_hash = hashlib.sha256(database_path.encode()).hexdigest()[:12]
+        return f'{database_name}_{path_hash}'
+
+    def file_path(self, table: BaseTable) -> str:
+        return os.path.join(self.path, f'{table.name()}.parquet')
+
+    @staticmethod
+    def fingerprint(table: BaseTable) -> str:
+        query = table.get_query()
+        key = [SNAPSHOT_FORMAT_VERSION, type(query).__name__, query.get_query(),
+               list(query.get_params()), table.dtypes()]
+        return hashlib.sha256(json.dumps(key, default=str).encode()).hexdigest()
+
+    def read(self, table: BaseTable) -> Optional[StoredSnapshot]:
+        """Stored snapshot of the table, None when missing, unreadable or of another query"""
+        file_path = self.file_path(table)
+        if not os.path.exists(file_path):
+            return None
+        try:
+            metadata, df = self._read_parquet(file_path)
+        except Exception:
+            logger.warning('Ignoring unreadable snapshot %s', file_path, exc_info=True)
+            return None
+        if metadata.get('fingerprint') != self.fingerprint(table):
+            return None
+        return StoredSnapshot(df, metadata['watermark'], metadata['change_counter'])
+
+    def write(self, table: BaseTable, df: pd.DataFrame, watermark: Optional[int],
+              change_counter: int) -> None:
+        metadata = {
+            'fingerprint': self.fingerprint(table),
+            'watermark': watermark,
+            'change_counter': change_counter,
+        }
+        os.makedirs(self.path, exist_ok=True)
+        file_path = self.file_path(table)
+        # written next to the target and renamed, readers never see a partial file
+        temp_path = f'{file_path}.{os.getpid()}.tmp'
+        try:
+            self._write_parquet(temp_path, metadata, df)
+            os.replace(temp_path, file_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    @staticmethod
+    def _read_parquet(file_path: str):
+        import pyarrow.parquet as pq
+
+        arrow_table = pq.read_table(file_path)
+        metadata = json.loads(arrow_table.schema.metadata[METADATA_KEY])
+        return metadata, arrow_table.to_pandas()
+
+    @staticmethod
+    def _write_parquet(file_path: str, metadata: Dict[str, Any], df: pd.DataFrame) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        arrow_table = pa.Table.from_pandas(df, preserve_index=False)
+        arrow_table = arrow_table.replace_schema_metadata({
+            **arrow_table.schema.metadata, METADATA_KEY: json.dumps(metadata).encode()})
+        pq.write_table(arrow_table, file_path)
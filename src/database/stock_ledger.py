@@ -0,0 +1,107 @@
+from config.paths import DATABASE
+from src.database import queries
+from src.database.executor import SqlExecutor, ensure_once
+from .tables import BaseTable, InventoryTable
+
+import argparse
+import os
+import pandas as pd
+
+
+class StockLedger:
+    """Running per-product stock balance, updated in the same transaction as order inserts"""
+
+    def __init__(self, table: BaseTable = InventoryTable(), database: str = DATABASE):
+        self.query: queries.StockLedgerQuery = table.get_query()
+        self.database = database
+
+    @property
+    def source_table(self) -> str:
+        return self.query.table_name
+
+    def tracks(self, table: BaseTable) -> bool:
+        return table.table_name == self.source_table
+
+    def ensure(self) -> None:
+        """Creates the ledger and fills it from order history, unless it already exists.
+        Checked once per process"""
+        ensure_once(('ledger', self.database, self.query.ledger_table), self.create)
+
+    def create(self) -> None:
+        with SqlExecutor(self.database) as executor:
+            exists = executor.cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?",
+                (self.query.ledger_table,),
+            ).fetchone()
+            if not exists:
+                executor.cursor.execute(f"""
+                    CREATE TABLE {self.query.ledger_table} (
+                        {' TEXT, '.join(self.query.groupby_columns)} TEXT,
+                        {self.query.sum_column} INTEGER NOT NULL,
+                        {self.query.sort_column} TEXT,
+                        PRIMARY KEY ({','.join(self.query.groupby_columns)})
+                    )
+                """)
+                executor.invalidate_schema_cache(self.query.ledger_table)
+                self.rebuild(executor)
+
+    def rebuild(self, executor: SqlExecutor) -> None:
+        """Recomputes all balances from order history"""
+        groupby_columns = ','.join(self.query.groupby_columns)
+        executor.cursor.execute(f"DELETE FROM {self.query.ledger_table}")
+        executor.cursor.execute(f"""
+            INSERT INTO {self.query.ledger_table}
+                ({groupby_columns}, {self.query.sum_column}, {self.query.sort_column})
+            SELECT
+                {groupby_columns},
+                SUM({self.query.column_to_sum}),
+                MAX({self.query.sort_column})
+            FROM {self.source_table}
+            GROUP BY {groupby_columns}
+        """)
+
+    def apply(self, df: pd.DataFrame, executor: SqlExecutor) -> None:
+        """Adds quantities of newly written order rows to the balances, the sort column keeps
+        the latest value, rows can be written with older values than already applied ones"""
+        sum_column = self.query.sum_column
+        changes = df \
+            .groupby(self.query.groupby_columns, as_index=False) \
+            .agg(**{sum_column: (self.query.column_to_sum, 'sum'),
+                    self.query.sort_column: (self.query.sort_column, 'max')})
+        columns = changes.columns.tolist()
+        sql = f"""
+            INSERT INTO {self.query.ledger_table} ({','.join(columns)})
+            VALUES ({','.join('?' * len(columns))})
+            ON CONFLICT ({','.join(self.query.groupby_columns)}) DO UPDATE SET
+                {sum_column} = {sum_column} + excluded.{sum_column},
+                {self.query.sort_column} = MAX(
+                    COALESCE({self.query.ledger_table}.{self.query.sort_column},
+                             excluded.{self.query.sort_column}),
+                    excluded.{self.query.sort_column})
+        """
+        executor.executemany_df(sql, changes)
+
+    def quantity_left(self, product_name: str) -> int:
+        self.ensure()
+        with SqlExecutor(self.database) as executor:
+            row = executor.cursor.execute(
+                f"""SELECT {self.query.sum_column} FROM {self.query.ledger_table}
+                    WHERE {self.query.groupby_columns[0]} = ?""",
+                (product_name,),
+            ).fetchone()
+        return row[0] if row else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Rebuild the stock ledger of a database from its order history")
+    parser.add_argument("database", help="database file, e.g. database/sandeliapp.db")
+    args = parser.parse_args()
+    if not os.path.exists(args.database):
+        parser.error(f"no database file {args.database}")
+
+    ledger = StockLedger(database=args.database)
+    ledger.ensure()
+    with SqlExecutor(ledger.database) as executor:
+        ledger.rebuild(executor)
+    print(f"Rebuilt {ledger.query.ledger_table} from {ledger.source_table}")
@@ -0,0 +1,12 @@
+from src.database import queries
+from .current_tables import ensure_current_table
+from .stock_ledger import StockLedger
+from .tables import BaseTable
+
+
+def ensure_table_storage(table: BaseTable, database: str) -> None:
+    """Creates tables derived from history that the table definition reads from"""
+    if table.reads_current_table:
+        ensure_current_table(table, database)
+    if isinstance(table.get_query(), queries.StockLedgerQuery):
+        StockLedger(table, database).ensure()
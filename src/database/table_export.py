@@ -0,0 +1,229 @@
+from config.paths import DATABASE
+from src.config import (
+    EXPORT_CHUNK_SIZE,
+    EXPORT_MAX_AGE,
+    EXPORT_PATH,
+    HAS_PYARROW,
+    SEP,
+    SORT_COLUMN,
+)
+from src.database.executor import SqlExecutor
+from src.database.storage import ensure_table_storage
+from src.database.tables import BaseTable
+
+import argparse
+import io
+import os
+import tempfile
+import time
+import zlib
+from dataclasses import dataclass, field
+from datetime import date
+from enum import Enum
+from typing import Any, BinaryIO, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+
+def sweep_exports(path: str = EXPORT_PATH, max_age: float = EXPORT_MAX_AGE) -> List[str]:
+    """Removes export files last written more than max_age seconds ago, returns their paths.
+    Exports are prepared ahead of their download and sessions may end before it."""
+    if not os.path.isdir(path):
+        return []
+    oldest = time.time() - max_age
+    removed = []
+    for entry in os.scandir(path):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < oldest:
+                os.remove(entry.path)
+                removed.append(entry.path)
+        except FileNotFoundError:  # swept by another session meanwhile
+            pass
+    return removed
+
+
+class ExportFormat(Enum):
+    csv = "csv"
+    csv_gzip = "csv.gz"
+    parquet = "parquet"
+
+    @property
+    def mime(self) -> str:
+        return {
+            ExportFormat.csv: "text/csv",
+            ExportFormat.csv_gzip: "application/gzip",
+            ExportFormat.parquet: "application/octet-stream",
+        }[self]
+
+    @classmethod
+    def available(cls) -> List["ExportFormat"]:
+        return [x for x in cls if x is not cls.parquet or HAS_PYARROW]
+
+
+@dataclass
+class TableExport:
+    """Rows of a table as its page loads them, streamed from sqlite in chunks.
+
+    Only one chunk of rows and its encoded bytes are held in memory at a time,
+    `columns` selects and orders output columns, all when empty, and the date range
+    filters rows on the date part of `date_column`, inclusive. Values are written as stored,
+    the compact dtypes of loaded tables only apply to frames in memory.
+    """
+
+    table: BaseTable
+    columns: List[str] = field(default_factory=list)
+    date_column: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    database: str = DATABASE
+    chunk_size: int = EXPORT_CHUNK_SIZE
+
+    def __post_init__(self):
+        self.executor: SqlExecutor = SqlExecutor(self.database)
+
+    def get_query(self, limit: Optional[int] = None) -> Tuple[str, Tuple[Any, ...]]:
+        ensure_table_storage(self.table, self.database)
+        query = self.table.get_query()
+        if limit is None:
+            self.check_columns()
+        conditions, params = [], list(query.get_params())
+        if self.date_column and self.start_date:
+            conditions.append(f"date({self.date_column}) >= ?")
+            params.append(self.start_date.isoformat())
+        if self.date_column and self.end_date:
+            conditions.append(f"date({self.date_column}) <= ?")
+            params.append(self.end_date.isoformat())
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        limit_clause = f"LIMIT {limit}" if limit is not None else ""
+        return f"""
+            SELECT {','.join(self.columns) or '*'}
+            FROM ({query.get_query()}) AS export
+            {where}
+            {limit_clause}
+        """, tuple(params)
+
+    def available_columns(self) -> List[str]:
+        """Output columns of the table query, read without fetching rows"""
+        sql, params = TableExport(self.table, database=self.database).get_query(limit=0)
+        with self.executor as executor:
+            cursor = executor.cursor.execute(sql, params)
+            return [description[0] for description in cursor.description]
+
+    def check_columns(self) -> None:
+        # column names go into the statement text, so only the query's own are accepted
+        requested = self.columns + ([self.date_column] if self.date_column else [])
+        unknown = set(requested) - set(self.available_columns())
+        if unknown:
+            raise ValueError(f"Unknown columns of {self.table.name()}: {sorted(unknown)}")
+
+    @staticmethod
+    def date_columns(columns: List[str]) -> List[str]:
+        return [x for x in columns if x.endswith("date") or x == SORT_COLUMN]
+
+    def iter_chunks(self) -> Iterator[pd.DataFrame]:
+        sql, params = self.get_query()
+        with self.executor as executor:
+            cursor = executor.cursor.execute(sql, params)
+            columns = [description[0] for description in cursor.description]
+            while True:
+                rows = cursor.fetchmany(self.chunk_size)
+                if not rows:
+                    break
+                # python values as sqlite returned them, e.g. integers with nulls stay integers
+                yield pd.DataFrame(rows, columns=columns, dtype=object)
+
+    def iter_csv(self) -> Iterator[bytes]:
+        header = True
+        for chunk in self.iter_chunks():
+            yield chunk.to_csv(sep=SEP, index=False, header=header).encode("utf-8")
+            header = False
+        if header:  # no rows, still write the header
+            yield pd.DataFrame(columns=self.columns or self.available_columns()) \
+                .to_csv(sep=SEP, index=False).encode("utf-8")
+
+    def iter_csv_gzip(self) -> Iterator[bytes]:
+        compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)  # gzip container
+        for data in self.iter_csv():
+            compressed = compressor.compress(data)
+            if compressed:
+                yield compressed
+        yield compressor.flush()
+
+    def iter_parquet(self) -> Iterator[bytes]:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        buffer = io.BytesIO()
+        writer = None
+        for chunk in self.iter_chunks():
+            batch = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(buffer, batch.schema)
+            # one row group per chunk, written out as soon as it is encoded
+            writer.write_table(batch.cast(writer.schema))
+            yield self._drain(buffer)
+        if writer is None:
+            columns = self.columns or self.available_columns()
+            writer = pq.ParquetWriter(
+                buffer, pa.Table.from_pandas(pd.DataFrame(columns=columns)).schema)
+        writer.close()
+        yield self._drain(buffer)
+
+    @staticmethod
+    def _drain(buffer: io.BytesIO) -> bytes:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    def iter_bytes(self, export_format: ExportFormat) -> Iterator[bytes]:
+        return {
+            ExportFormat.csv: self.iter_csv,
+            ExportFormat.csv_gzip: self.iter_csv_gzip,
+            ExportFormat.parquet: self.iter_parquet,
+        }[export_format]()
+
+    def write(self, file: BinaryIO, export_format: ExportFormat = ExportFormat.csv) -> int:
+        """Writes the export into a binary file, returns the number of bytes written"""
+        written = 0
+        for data in self.iter_bytes(export_format):
+            file.write(data)
+            written += len(data)
+        return written
+
+    def write_file(self, export_format: ExportFormat = ExportFormat.csv,
+                   path: str = EXPORT_PATH) -> str:
+        """Writes the export into a new file in the export directory, returns its path.
+        Exports older than EXPORT_MAX_AGE are swept first"""
+        sweep_exports(path)
+        os.makedirs(path, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+                dir=path, prefix=f"{self.table.name()}_", suffix=f".{export_format.value}",
+                delete=False) as file:
+            try:
+                self.write(file, export_format)
+            except BaseException:
+                file.close()
+                os.remove(file.name)
+                raise
+        return file.name
+
+
+if __name__ == "__main__":
+    from src.database import tables
+
+    parser = argparse.ArgumentParser(description="Export a table straight from the database")
+    parser.add_argument("table", help="table class name, e.g. OrdersTable")
+    parser.add_argument("output", type=argparse.FileType("wb"))
+    parser.add_argument("--format", type=ExportFormat, default=ExportFormat.csv,
+                        choices=ExportFormat.available())
+    parser.add_argument("--columns", nargs="+", help="output columns, all by default")
+    parser.add_argument("--date-column")
+    parser.add_argument("--start-date", type=date.fromisoformat)
+    parser.add_argument("--end-date", type=date.fromisoformat)
+    parser.add_argument("--database", default=DATABASE)
+    args = parser.parse_args()
+
+    export = TableExport(getattr(tables, args.table)(), args.columns or [],
+                         args.date_column, args.start_date, args.end_date, args.database)
+    print(f"Wrote {export.write(args.output, args.format)} bytes")
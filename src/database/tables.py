@@ -1,13 +1,26 @@
-from config.formats import DATE_FORMAT
+from src import entities
+from src.config import CURRENT_TABLE_SUFFIX, SORT_COLUMN, STOCK_LEDGER_TABLE, USE_CURRENT_TABLES
+from src.database import queries
 
 from abc import ABC
+from enum import EnumMeta
 from pydantic.dataclasses import dataclass
 from dataclasses import field
 from typing import List, Dict, Any
-from datetime import datetime, date
+from datetime import date
 
 
-NON_ARGUMENT_ATTRS = ['__initialised__', 'query', 'processing']
+NON_ARGUMENT_ATTRS = ['__initialised__', 'query', 'processing', 'use_current_table', 'entity']
+
+# order rows keep identifying attributes of nested entities, plus computed amounts
+ORDER_COLUMNS = [
+    'order_id', 'order_date', 'order_type',
+    'manager_id', 'manager_name', 'manager_location',
+    'customer_id', 'customer_name',
+    'product_id', 'product_name', 'product_category', 'manufacturer',
+    'quantity', 'discount', 'price', 'discount_amount', 'price_with_vat', 'price_with_discount',
+    'price_with_discount_vat', 'sum', 'sum_vat', 'payment_terms', 'payment_due', SORT_COLUMN,
+]
 
 
 @dataclass
@@ -16,6 +29,11 @@ class BaseTable(ABC):
     table_name: str
     query: str
     processing: str
+    # read latest versions from a companion table maintained by the exporter,
+    # only applies to tables loaded with LatestRowQuery
+    use_current_table: bool = USE_CURRENT_TABLES
+    # name of the entity stored in the table, column dtypes are derived from its schema
+    entity: str = ''
 
     def argument_dict(self) -> Dict[str, Any]:
         return {k: v for k, v in self.__dict__.items() if k not in NON_ARGUMENT_ATTRS}
@@ -24,17 +42,56 @@ class BaseTable(ABC):
     def name(cls) -> str:
         return cls.__name__.lower()
 
+    @property
+    def current_table_name(self) -> str:
+        return f'{self.table_name}{CURRENT_TABLE_SUFFIX}'
+
+    @property
+    def reads_current_table(self) -> bool:
+        """Whether the table is read from its current table, see use_current_table"""
+        return self.use_current_table and self.query == 'LatestRowQuery'
+
+    def get_query(self) -> queries.LoaderQuery:
+        if self.reads_current_table:
+            return queries.CurrentRowQuery(
+                table_name=self.current_table_name,
+                groupby_columns=self.groupby_columns,
+                sort_column=self.sort_column,
+                columns=self.columns,
+                history_table=self.table_name,
+            )
+        return getattr(queries, self.query)(**self.argument_dict())
+
+    def entity_columns(self) -> List[str]:
+        return list(getattr(entities, self.entity).flat_schema()) + [SORT_COLUMN]
+
+    def dtypes(self) -> Dict[str, str]:
+        """Compact pandas dtypes of entity columns, categoricals for enums, datetime64 for dates.
+        Applied to loaded frames in memory only, exports and writes keep the stored values"""
+        if not self.entity:
+            return {}
+        dtypes = {}
+        for column, column_type in getattr(entities, self.entity).flat_schema().items():
+            if isinstance(column_type, EnumMeta):
+                dtypes[column] = 'category'
+            elif column_type is date:
+                dtypes[column] = 'datetime64[ns]'
+        return dtypes
+
 
 @dataclass
 class CustomerTable(BaseTable):
     table_name: str = 'customer'
     groupby_columns: List[str] = field(default_factory=list)
     sort_column: str = 'timestamp'
+    columns: List[str] = field(default_factory=list)
     query: str = 'LatestRowQuery'
     processing: str = 'DefaultProcessing'
+    entity: str = 'Customer'
 
     def __post_init__(self):
         self.groupby_columns = ['customer_id']
+        self.columns = self.entity_columns()
 
 
 @dataclass
@@ -42,11 +99,14 @@ class ManagerTable(BaseTable):
     table_name: str = 'manager'
     groupby_columns: List[str] = field(default_factory=list)
     sort_column: str = 'timestamp'
+    columns: List[str] = field(default_factory=list)
     query: str = 'LatestRowQuery'
     processing: str = 'DefaultProcessing'
+    entity: str = 'Manager'
 
     def __post_init__(self):
         self.groupby_columns = ['manager_id']
+        self.columns = self.entity_columns()
 
 
 @dataclass
@@ -54,11 +114,14 @@ class ProductTable(BaseTable):
     table_name: str = 'product'
     groupby_columns: List[str] = field(default_factory=list)
     sort_column: str = 'timestamp'
+    columns: List[str] = field(default_factory=list)
     query: str = 'LatestRowQuery'
     processing: str = 'DefaultProcessing'
+    entity: str = 'Product'
 
     def __post_init__(self):
         self.groupby_columns = ['product_id']
+        self.columns = self.entity_columns()
 
 
 @dataclass
@@ -66,7 +129,9 @@ class InventoryTable(BaseTable):
     table_name: str = 'orders'
     groupby_columns: List[str] = field(default_factory=list)
     column_to_sum: str = 'quantity'
-    query: str = 'GroupedSumQuery'
+    sort_column: str = 'timestamp'
+    ledger_table: str = STOCK_LEDGER_TABLE
+    query: str = 'StockLedgerQuery'
     processing: str = 'DefaultProcessing'
 
     def __post_init__(self):
@@ -78,19 +143,27 @@ class OrdersTable(BaseTable):
     table_name: str = 'orders'
     groupby_columns: List[str] = field(default_factory=list)
     sort_column: str = 'timestamp'
+    columns: List[str] = field(default_factory=list)
     query: str = 'LatestRowQuery'
     processing: str = 'OrderProcessing'
+    entity: str = 'Orders'
 
     def __post_init__(self):
         self.groupby_columns = ['order_id']
+        self.columns = ORDER_COLUMNS
 
 
 @dataclass
 class DiscountTable(BaseTable):
+    # all discounts, not only those valid today, the discount index resolves them by date
     table_name: str = 'discount'
-    filter_date: date = datetime.now().date()
-    start_date_column: str = 'start_date'
-    end_date_column: str = 'end_date'
-    date_format: str = DATE_FORMAT
-    query: str = 'ValidDateQuery'
+    groupby_columns: List[str] = field(default_factory=list)
+    sort_column: str = 'timestamp'
+    columns: List[str] = field(default_factory=list)
+    query: str = 'LatestRowQuery'
     processing: str = 'DefaultProcessing'
+    entity: str = 'Discount'
+
+    def __post_init__(self):
+        self.groupby_columns = ['discount_id']
+        self.columns = self.entity_columns()
@@ -0,0 +1,157 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from src.database.loader import Loader
+from src.database.tables import DiscountTable
+from src.entities import DiscountLevel, Product
+
+# most specific level first, a product name discount overrides its category and manufacturer
+LEVEL_PRIORITY: List[DiscountLevel] = [
+    DiscountLevel.product_name,
+    DiscountLevel.product_category,
+    DiscountLevel.manufacturer,
+]
+
+
+@dataclass(frozen=True)
+class DiscountInterval:
+    discount_id: str
+    discount_level: DiscountLevel
+    discount_identifier: str
+    start_date: date
+    end_date: date
+    discount_percent: float
+
+
+class DiscountIntervals:
+    """Discounts of one level and identifier sorted by start date, with a segment tree of the
+    latest end date per range of positions for lookups by date in O(log n)"""
+
+    def __init__(self, intervals: List[DiscountInterval]):
+        self.intervals = sorted(
+            intervals, key=lambda x: (x.start_date, x.discount_percent, x.discount_id))
+        self.start_dates = [x.start_date for x in self.intervals]
+        # node 1 covers all positions, children of node i are 2i and 2i + 1,
+        # leaves start at self.size, empty leaves hold date.min
+        self.size = 1
+        while self.size < len(self.intervals):
+            self.size *= 2
+        self.max_end_dates = [date.min] * (2 * self.size)
+        for position, interval in enumerate(self.intervals):
+            self.max_end_dates[self.size + position] = interval.end_date
+        for node in range(self.size - 1, 0, -1):
+            self.max_end_dates[node] = max(
+                self.max_end_dates[2 * node], self.max_end_dates[2 * node + 1])
+
+    def _last_ending_after(self, node: int, low: int, high: int, limit: int,
+                           on_date: date) -> int:
+        """Last position below limit in the node's range [low, high) with an end date on or
+        after on_date, -1 if none. Only nodes on the path to limit are split, any other node
+        with a late enough end date holds a match, so the search takes O(log n) steps"""
+        if low >= limit or self.max_end_dates[node] < on_date:
+            return -1
+        if high - low == 1:
+            return low
+        middle = (low + high) // 2
+        position = self._last_ending_after(2 * node + 1, middle, high, limit, on_date)
+        if position < 0:
+            position = self._last_ending_after(2 * node, low, middle, limit, on_date)
+        return position
+
+    def _ending_after(self, node: int, low: int, high: int, limit: int, on_date: date,
+                      positions: List[int]) -> None:
+        if low >= limit or self.max_end_dates[node] < on_date:
+            return
+        if high - low == 1:
+            positions.append(low)
+            return
+        middle = (low + high) // 2
+        self._ending_after(2 * node, low, middle, limit, on_date, positions)
+        self._ending_after(2 * node + 1, middle, high, limit, on_date, positions)
+
+    def valid_on(self, on_date: date) -> Optional[DiscountInterval]:
+        """Latest starting discount valid on the date, ties go to the higher percent"""
+        limit = bisect_right(self.start_dates, on_date)
+        position = self._last_ending_after(1, 0, self.size, limit, on_date)
+        return self.intervals[position] if position >= 0 else None
+
+    def overlapping(self, start_date: date, end_date: date) -> List[DiscountInterval]:
+        """Discounts valid on any day from start_date to end_date, by start date"""
+        positions: List[int] = []
+        limit = bisect_right(self.start_dates, end_date)
+        self._ending_after(1, 0, self.size, limit, start_date, positions)
+        return [self.intervals[position] for position in positions]
+
+
+class DiscountIndex:
+    """Discount lookup by product and date over all discount levels.
+
+    A product gets the discount valid on the date at the most specific level in LEVEL_PRIORITY,
+    levels are not combined.
+    """
+
+    def __init__(self, discount_df: pd.DataFrame):
+        grouped: Dict[Tuple[DiscountLevel, str], List[DiscountInterval]] = {}
+        for row in self._to_records(discount_df):
+            interval = DiscountInterval(**row)
+            grouped.setdefault((interval.discount_level, interval.discount_identifier), []) \
+                .append(interval)
+        self._intervals = {key: DiscountIntervals(value) for key, value in grouped.items()}
+
+    @staticmethod
+    def _to_records(discount_df: pd.DataFrame) -> List[dict]:
+        columns = list(DiscountInterval.__annotations__)
+        df = discount_df[columns].assign(
+            discount_level=lambda x: x['discount_level'].astype(str).map(DiscountLevel),
+            discount_identifier=lambda x: x['discount_identifier'].astype(str),
+            start_date=lambda x: pd.to_datetime(x['start_date']).dt.date,
+            end_date=lambda x: pd.to_datetime(x['end_date']).dt.date,
+        )
+        return df.to_dict('records')
+
+    def __len__(self) -> int:
+        return sum(len(x.intervals) for x in self._intervals.values())
+
+    def discounts(self, level: DiscountLevel, identifier: str) -> List[DiscountInterval]:
+        """All discounts of the level and identifier, past and future ones included"""
+        intervals = self._intervals.get((level, identifier))
+        return intervals.intervals if intervals else []
+
+    def overlapping(self, level: DiscountLevel, identifier: str, start_date: date,
+                    end_date: Optional[date] = None) -> List[DiscountInterval]:
+        """Discounts valid on any day of the date range, on start_date only without end_date"""
+        intervals = self._intervals.get((level, identifier))
+        if not intervals:
+            return []
+        return intervals.overlapping(start_date, end_date or start_date)
+
+    def active(self, level: DiscountLevel, identifier: str,
+               on_date: date) -> Optional[DiscountInterval]:
+        intervals = self._intervals.get((level, identifier))
+        return intervals.valid_on(on_date) if intervals else None
+
+    def resolve(self, product: Product, on_date: date) -> Optional[DiscountInterval]:
+        for level in LEVEL_PRIORITY:
+            discount = self.active(level, getattr(product, level.value), on_date)
+            if discount is not None:
+                return discount
+        return None
+
+    def resolve_many(self, products: List[Product],
+                     on_date: date) -> List[Optional[DiscountInterval]]:
+        """Discounts of the products in the same order, repeated products are resolved once"""
+        resolved: Dict[Tuple[str, ...], Optional[DiscountInterval]] = {}
+        keys = [tuple(getattr(product, level.value) for level in LEVEL_PRIORITY)
+                for product in products]
+        for key, product in zip(keys, products):
+            if key not in resolved:
+                resolved[key] = self.resolve(product, on_date)
+        return [resolved[key] for key in keys]
+
+
+def get_discount_index(dataloader: Loader) -> DiscountIndex:
+    """Index of all discounts in the loaded discount table, built once per table version"""
+    return dataloader.derived(DiscountTable.name(), 'discount_index', DiscountIndex)
@@ -1,11 +1,18 @@
 from abc import ABC
 from datetime import date
 from enum import Enum
-from typing import Dict
+from typing import Dict, List, NamedTuple, Tuple
 
 from pydantic.dataclasses import dataclass
 
 
+class FlatField(NamedTuple):
+    column: str
+    # attribute names leading to the value from the flattened entity
+    path: Tuple[str, ...]
+    type: type
+
+
 @dataclass
 class Entity(ABC):
     @classmethod
@@ -20,6 +27,26 @@ class Entity(ABC):
     def schema(cls) -> Dict[str, type]:
         return dict(cls.__annotations__)
 
+    @classmethod
+    def flat_fields(cls) -> List[FlatField]:
+        """Attributes with those of nested entities inlined under their own names, as stored
+        in table rows, the one description of row columns for table dtypes and processing"""
+        fields = []
+        for attribute_name, attribute_type in cls.schema().items():
+            if isinstance(attribute_type, type) and issubclass(attribute_type, Entity):
+                fields += [
+                    FlatField(x.column, (attribute_name,) + x.path, x.type)
+                    for x in attribute_type.flat_fields()
+                ]
+            else:
+                fields.append(FlatField(attribute_name, (attribute_name,), attribute_type))
+        return fields
+
+    @classmethod
+    def flat_schema(cls) -> Dict[str, type]:
+        """Column name to type of table rows, see flat_fields"""
+        return {x.column: x.type for x in cls.flat_fields()}
+
 
 class AccessLevel(Enum):
     admin = "admin"
@@ -0,0 +1,74 @@
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Type
+
+from src.config import COLUMN_NAME_SEPARATOR, ENTITY_CACHE_SIZE, ID_SUFFIX, SORT_COLUMN
+from src.entities import Entity
+
+
+@dataclass
+class EntityCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.
+
+
+class EntityCache:
+    """Bounded LRU of validated entities, shared by all sessions of the process.
+
+    Entities built from table rows are keyed by type, id and row timestamp, rows are never
+    updated in place, so a new version of an entity always gets a new key. Cached entities
+    are shared and must not be modified.
+    """
+
+    def __init__(self, max_size: int = ENTITY_CACHE_SIZE):
+        self.max_size = max_size
+        self.stats = EntityCacheStats()
+        self._entities: 'OrderedDict[Hashable, Entity]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Entity]) -> Entity:
+        with self._lock:
+            entity = self._entities.get(key)
+            if entity is not None:
+                self._entities.move_to_end(key)
+                self.stats.hits += 1
+                return entity
+            self.stats.misses += 1
+        # validation runs outside the lock, concurrent misses of one key build it twice at worst
+        entity = factory()
+        with self._lock:
+            self._entities[key] = entity
+            self._entities.move_to_end(key)
+            while len(self._entities) > self.max_size:
+                self._entities.popitem(last=False)
+                self.stats.evictions += 1
+        return entity
+
+    def from_record(self, entity_type: Type[Entity], record: Dict[str, Any]) -> Entity:
+        """Entity from a table row, extra columns of the row are ignored"""
+        attributes = {column: record[column] for column in entity_type.attribute_list()}
+        id_column = COLUMN_NAME_SEPARATOR.join([entity_type.name(), ID_SUFFIX])
+        if id_column in record and SORT_COLUMN in record:
+            key = (entity_type, record[id_column], record[SORT_COLUMN])
+        else:
+            key = (entity_type, *attributes.values())
+        return self.get_or_create(key, lambda: entity_type(**attributes))
+
+    def from_values(self, entity_type: Type[Entity], values: Dict[str, Any]) -> Entity:
+        """Entity from attribute values, e.g. form inputs, keyed by the values themselves"""
+        key = (entity_type, *values.items())
+        return self.get_or_create(key, lambda: entity_type(**values))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entities.clear()
+
+
+entity_cache = EntityCache()
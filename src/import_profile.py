@@ -0,0 +1,111 @@
+"""Import time of the app entry point per module, measured in fresh interpreters with
+python -X importtime, for tracking time to first page.
+
+    python -m src.import_profile --top 20
+    python -m src.import_profile --json startup.json --max-ms 1500
+
+Modules of DEFERRED_MODULES are imported by the pages when first used, --check-deferred
+exits with 1 when the entry point imports any of them.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from typing import Dict, List
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# imported on first save and first invoice, see AppTemplate.entity_processor
+DEFERRED_MODULES = ["src.processing", "src.invoice", "borb"]
+
+
+@dataclass
+class ModuleImport:
+    module: str
+    # microseconds, self excludes the modules it imported
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(stderr: str) -> List[ModuleImport]:
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        imports.append(ModuleImport(module.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def profile_once(module: str) -> List[ModuleImport]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+    )
+    return parse_importtime(result.stderr)
+
+
+def profile(module: str, repeat: int) -> List[ModuleImport]:
+    """Median times per module over fresh interpreters, modules in first run order"""
+    runs = [{x.module: x for x in profile_once(module)} for _ in range(repeat)]
+    return [
+        ModuleImport(
+            name,
+            int(statistics.median(run[name].self_us for run in runs if name in run)),
+            int(statistics.median(run[name].cumulative_us for run in runs if name in run)),
+        )
+        for name in runs[0]
+    ]
+
+
+def deferred_imports(imports: List[ModuleImport]) -> List[str]:
+    """Imported modules that belong to DEFERRED_MODULES"""
+    return [
+        x.module for x in imports
+        if any(x.module == name or x.module.startswith(f"{name}.") for name in DEFERRED_MODULES)
+    ]
+
+
+def by_package(imports: List[ModuleImport]) -> Dict[str, int]:
+    """Self time summed per top level package, microseconds"""
+    packages: Dict[str, int] = {}
+    for x in imports:
+        package = x.module.split(".")[0]
+        packages[package] = packages.get(package, 0) + x.self_us
+    return dict(sorted(packages.items(), key=lambda x: x[1], reverse=True))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--module", default="main", help="module imported on app start")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--json", help="file to write per module times to")
+    parser.add_argument("--max-ms", type=float, help="exit with 1 when the total is higher")
+    parser.add_argument("--check-deferred", action="store_true",
+                        help="exit with 1 when a deferred module is imported")
+    args = parser.parse_args()
+
+    imports = profile(args.module, args.repeat)
+    total_ms = sum(x.self_us for x in imports) / 1000
+    print(f"import {args.module}: {total_ms:.0f}ms, {len(imports)} modules, "
+          f"median of {args.repeat} runs")
+    print("\nSlowest modules, cumulative ms:")
+    for x in sorted(imports, key=lambda x: x.cumulative_us, reverse=True)[:args.top]:
+        print(f"{x.cumulative_us / 1000:10.1f}  {x.module}")
+    print("\nPackages, self ms:")
+    for package, self_us in list(by_package(imports).items())[:args.top]:
+        print(f"{self_us / 1000:10.1f}  {package}")
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"module": args.module, "total_ms": total_ms,
+                       "modules": [asdict(x) for x in imports]}, file, indent=2)
+    deferred = deferred_imports(imports)
+    if args.check_deferred and deferred:
+        print(f"\nDeferred modules imported on start: {', '.join(deferred)}")
+        sys.exit(1)
+    if args.max_ms is not None and total_ms > args.max_ms:
+        print(f"\nImport time {total_ms:.0f}ms is over the {args.max_ms:.0f}ms limit")
+        sys.exit(1)
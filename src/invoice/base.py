@@ -1,11 +1,17 @@
+import copy
+import io
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
+from dataclasses import asdict, dataclass
 from datetime import date
 from decimal import Decimal
 from enum import Enum
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, Optional, Type
 
 import pandas as pd
+from borb.io.read.types import Decimal as bDecimal
+from borb.pdf.canvas.font.simple_font.font_type_1 import StandardType1Font
 from borb.pdf.canvas.layout.image.image import Image
 from borb.pdf.canvas.layout.layout_element import Alignment
 from borb.pdf.canvas.layout.page_layout.multi_column_layout import SingleColumnLayout
@@ -15,14 +21,32 @@ from borb.pdf.canvas.layout.text.paragraph import Paragraph
 from borb.pdf.document import Document
 from borb.pdf.page.page import Page
 from borb.pdf.pdf import PDF
-from config.paths import INVOICE_PATH
-from src.entities import Customer
+from config.paths import LOGO_PATH
+from PIL import Image as PILImage
+from src.entities import Customer, CustomerType, PaymetTerms
+from src.pricing import OrderTotals
 
 # TODO: this probably has to be a separate status table with active accounts/banks payment text
 BANK = "Lehmann Brothers"
 PAYMENT_ACCOUNT = "LT79 1234 5678 7777 0000"
 PAYMENT_TEXT = "Please include invoice number in payment details"
 
+# TODO: need to have method to load seller from customer table
+SELLER = Customer(
+    customer_id="0",
+    customer_name="UAB Medexy",
+    customer_type=CustomerType.default,
+    pricing_factor=1.0,
+    payment_terms=PaymetTerms.days_30,
+    address="Ukmergers g. 241",
+    post_code="LT-12345",
+    customer_location="Vilnius",
+    email="info@medexy.lt",
+    telephone="+370 526 53483",
+    customer_code="300154866",
+    vat_code="LT24 3500 0100 0132 3457",
+)
+
 
 @dataclass
 class Font:
@@ -44,6 +68,66 @@ class CustomerAttributes(Enum):
     TELEPHONE: str = "telephone"
 
 
+class InvoiceFont(StandardType1Font):
+    """Standard font measuring glyphs with a width dict, borb's own font scans all
+    font metrics for every measured character"""
+
+    # standard fonts are single byte encoded, so all their codes are measured up front
+    CHARACTER_CODES = range(256)
+
+    def __init__(self, font_name: Optional[str] = None):
+        super().__init__(font_name)
+        self._widths: Dict[int, bDecimal] = {}
+        if font_name is not None:
+            self._widths = {
+                code: StandardType1Font.get_width(self, code) for code in self.CHARACTER_CODES
+            }
+
+    def _empty_copy(self) -> "InvoiceFont":
+        return InvoiceFont()
+
+    def __deepcopy__(self, memodict={}):
+        font = super().__deepcopy__(memodict)
+        font._widths = self._widths
+        return font
+
+    def get_width(self, character_identifier: int) -> bDecimal:
+        width = self._widths.get(character_identifier)
+        return width if width is not None else super().get_width(character_identifier)
+
+
+class InvoiceResources:
+    """Invoice parts which are the same on every invoice, prepared once per process"""
+
+    def __init__(
+        self, logo_path: Path = LOGO_PATH, font_type: Type[StandardType1Font] = InvoiceFont
+    ):
+        self.fonts: Dict[str, StandardType1Font] = {
+            font_name: font_type(font_name) for font_name in asdict(Font()).values()
+        }
+        self.logo: PILImage.Image = PILImage.open(logo_path)
+        self.logo.load()
+        self.payment_footer = [
+            f"Bank: {BANK}",
+            f"Account: {PAYMENT_ACCOUNT}",
+            PAYMENT_TEXT,
+        ]
+
+    def document_fonts(self) -> Dict[str, StandardType1Font]:
+        # fonts become objects of the document they are used in, so every document gets
+        # copies, which share the parsed font metrics
+        return {font_name: copy.deepcopy(font) for font_name, font in self.fonts.items()}
+
+    def logo_image(self) -> Image:
+        # same for the image, borb attaches pdf object state to it
+        return Image(image=self.logo.copy(), width=100, height=19)
+
+
+@lru_cache(maxsize=None)
+def get_invoice_resources() -> InvoiceResources:
+    return InvoiceResources()
+
+
 @dataclass
 class InvoiceInfo:
     invoice_type: InvoiceType
@@ -52,15 +136,23 @@ class InvoiceInfo:
     buyer: Customer
     seller: Customer
     order_df: pd.DataFrame
+    # totals the order was priced with, stored orders have theirs read from order_df
+    totals: Optional[OrderTotals] = None
+
+    @property
+    def order_totals(self) -> OrderTotals:
+        return self.totals or OrderTotals.from_stored_lines(self.order_df)
 
 
 class InvoiceTemplate(ABC):
-    def __init__(self, invoice_info: InvoiceInfo):
+    def __init__(self, invoice_info: InvoiceInfo, resources: Optional[InvoiceResources] = None):
         self.invoice_info = invoice_info
+        self.resources = resources or get_invoice_resources()
+        self.fonts = self.resources.document_fonts()
         self.pdf: Document = Document()
 
     @abstractmethod
-    def generate(self) -> None:
+    def generate(self) -> bytes:
         ...
 
     def initialize_document(self) -> SingleColumnLayout:
@@ -68,27 +160,26 @@ class InvoiceTemplate(ABC):
         self.pdf.append_page(page)
         return SingleColumnLayout(page, vertical_margin=Decimal(30), horizontal_margin=Decimal(30))
 
-    @staticmethod
-    def get_logo_image(path: Path) -> Image:
-        return Image(image=path, width=100, height=19)
+    def get_logo_image(self) -> Image:
+        return self.resources.logo_image()
 
     def get_title(self) -> Table:
         t = Table(number_of_rows=3, number_of_columns=1, padding_bottom=Decimal(10))
         title = Paragraph(
             self.invoice_info.invoice_type.value,
-            font=Font.bold,
+            font=self.fonts[Font.bold],
             font_size=Decimal(14),
             horizontal_alignment=Alignment.CENTERED,
         )
         invoice_number = Paragraph(
             self.invoice_info.invoice_number,
-            font=Font.default,
+            font=self.fonts[Font.default],
             font_size=Decimal(11),
             horizontal_alignment=Alignment.CENTERED,
         )
         invoice_date = Paragraph(
             self.invoice_info.invoice_date,
-            font=Font.default,
+            font=self.fonts[Font.default],
             font_size=Decimal(11),
             horizontal_alignment=Alignment.CENTERED,
         )
@@ -105,7 +196,7 @@ class InvoiceTemplate(ABC):
             info_items.append(self.invoice_info.buyer.__dict__[attribute.value])
 
         for i, item in enumerate(info_items):
-            font = Font.bold if i in [2, 3] else Font.default
+            font = self.fonts[Font.bold if i in [2, 3] else Font.default]
             t.add(Paragraph(item, font=font, font_size=Decimal(10)))
 
         t.no_borders()
@@ -119,15 +210,16 @@ class InvoiceTemplate(ABC):
             f"Invoice issued by: {manager}",
             f"Payment terms: 30 days, {payment_due_date}",
             f"Tel.: {self.invoice_info.seller.telephone}",
-            f"Bank: {BANK}",
-            f"Account: {PAYMENT_ACCOUNT}",
-            PAYMENT_TEXT,
+            *self.resources.payment_footer,
         ]
         for text in info:
-            t.add(TableCell(Paragraph(text, font=Font.default, font_size=Decimal(8))))
+            t.add(
+                TableCell(Paragraph(text, font=self.fonts[Font.default], font_size=Decimal(8)))
+            )
         t.no_borders()
         return t
 
-    def save_pdf(self) -> None:
-        with open(INVOICE_PATH, "wb") as pdf_file_handle:
-            PDF.dumps(pdf_file_handle, self.pdf)
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        PDF.dumps(buffer, self.pdf)
+        return buffer.getvalue()
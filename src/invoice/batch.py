@@ -0,0 +1,173 @@
+import argparse
+import logging
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import pandas as pd
+from config.paths import DATABASE
+from src.config import INVOICE_BATCH_WORKERS
+from src.database.cache import TableCache
+from src.database.executor import SqlExecutor
+from src.database.tables import ORDER_COLUMNS, CustomerTable, OrdersTable
+from src.entities import Customer
+from src.entity_cache import entity_cache
+
+from .base import SELLER, InvoiceInfo, InvoiceType
+from .vat import VATInvoice
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class InvoiceJob:
+    order_id: str
+    buyer: Customer
+    order_df: pd.DataFrame
+
+    @property
+    def invoice_date(self) -> str:
+        return self.order_df.iloc[0].order_date
+
+    @property
+    def filename(self) -> str:
+        filename_args = [InvoiceType.VAT.name, "invoice", self.invoice_date, self.order_id]
+        return "_".join(filename_args) + ".pdf"
+
+
+@dataclass
+class BatchStats:
+    invoices: int = 0
+    bytes: int = 0
+    seconds: float = 0.
+    # order ids without a matching customer or failing to render
+    failed: List[str] = field(default_factory=list)
+
+    @property
+    def invoices_per_second(self) -> float:
+        return self.invoices / self.seconds if self.seconds else 0.
+
+
+def render_job(job: InvoiceJob) -> bytes:
+    """Runs in a worker process"""
+    invoice_info = InvoiceInfo(
+        invoice_type=InvoiceType.VAT,
+        invoice_number=job.order_id,
+        invoice_date=job.invoice_date,
+        buyer=job.buyer,
+        seller=SELLER,
+        order_df=job.order_df,
+    )
+    return VATInvoice(invoice_info).generate()
+
+
+def log_progress(done: int, total: int) -> None:
+    if done == total or done % max(total // 20, 1) == 0:
+        logger.info("Rendered %s/%s invoices", done, total)
+
+
+class BatchInvoiceGenerator:
+    """Renders invoices of stored orders across a process pool, e.g. for month-end reprints"""
+
+    def __init__(self, database: str = DATABASE, workers: int = INVOICE_BATCH_WORKERS):
+        self.executor: SqlExecutor = SqlExecutor(database)
+        self.workers = workers
+
+    def load_orders(self, start_date: Optional[date] = None, end_date: Optional[date] = None,
+                    order_ids: Optional[List[str]] = None) -> pd.DataFrame:
+        conditions, params = [], []
+        if start_date is not None:
+            conditions.append("order_date >= ?")
+            params.append(start_date.isoformat())
+        if end_date is not None:
+            conditions.append("order_date <= ?")
+            params.append(end_date.isoformat())
+        if order_ids is not None:
+            # one bound parameter however many ids are given
+            conditions.append("order_id IN (SELECT value FROM json_each(?))")
+            params.append(pd.Series(order_ids).to_json(orient="values"))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self.executor as executor:
+            return executor.read_df(f"""
+                SELECT {','.join(ORDER_COLUMNS)}
+                FROM {OrdersTable.table_name}
+                {where}
+                ORDER BY order_id, rowid
+            """, params)
+
+    def build_jobs(self, orders_df: pd.DataFrame, stats: BatchStats) -> List[InvoiceJob]:
+        # buyers are printed with their current details, read without table snapshots,
+        # which would be left next to the app database for any database the batch runs on
+        customers = TableCache(self.executor.database, use_snapshots=False).get(CustomerTable())
+        jobs = []
+        for order_id, order_df in orders_df.groupby("order_id", sort=False):
+            record = customers.record("customer_id", order_df.iloc[0].customer_id)
+            if record is None:
+                logger.warning("No customer %s for order %s",
+                               order_df.iloc[0].customer_id, order_id)
+                stats.failed.append(order_id)
+                continue
+            buyer = entity_cache.from_record(Customer, record)
+            jobs.append(InvoiceJob(order_id, buyer, order_df.reset_index(drop=True)))
+        return jobs
+
+    def run(self, output: Path, start_date: Optional[date] = None,
+            end_date: Optional[date] = None, order_ids: Optional[List[str]] = None,
+            progress: Callable[[int, int], None] = log_progress) -> BatchStats:
+        """Writes one pdf per order into the output directory, or zip if it ends with .zip"""
+        stats = BatchStats()
+        start = time.perf_counter()
+        jobs = self.build_jobs(self.load_orders(start_date, end_date, order_ids), stats)
+        if output.suffix == ".zip":
+            archive = zipfile.ZipFile(output, "w", compression=zipfile.ZIP_DEFLATED)
+            write = archive.writestr
+        else:
+            archive = None
+            output.mkdir(parents=True, exist_ok=True)
+
+            def write(filename: str, pdf: bytes) -> None:
+                (output / filename).write_bytes(pdf)
+
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                futures = {pool.submit(render_job, job): job for job in jobs}
+                for done, future in enumerate(as_completed(futures), start=1):
+                    job = futures[future]
+                    try:
+                        pdf = future.result()
+                    except Exception:
+                        logger.exception("Failed to render invoice for order %s", job.order_id)
+                        stats.failed.append(job.order_id)
+                    else:
+                        write(job.filename, pdf)
+                        stats.invoices += 1
+                        stats.bytes += len(pdf)
+                    progress(done, len(jobs))
+        finally:
+            if archive is not None:
+                archive.close()
+        stats.seconds = time.perf_counter() - start
+        return stats
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    parser = argparse.ArgumentParser(description="Render invoices of stored orders")
+    parser.add_argument("output", type=Path, help="output directory, or .zip file")
+    parser.add_argument("--start-date", type=date.fromisoformat)
+    parser.add_argument("--end-date", type=date.fromisoformat)
+    parser.add_argument("--order-ids", nargs="+", help="instead of or within the date range")
+    parser.add_argument("--workers", type=int, default=INVOICE_BATCH_WORKERS)
+    parser.add_argument("--database", default=DATABASE)
+    args = parser.parse_args()
+
+    stats = BatchInvoiceGenerator(args.database, args.workers).run(
+        args.output, args.start_date, args.end_date, args.order_ids)
+    print(f"Rendered {stats.invoices} invoices ({stats.bytes / 2**20:.1f} MiB) "
+          f"in {stats.seconds:.1f}s, {stats.invoices_per_second:.1f} invoices/s")
+    if stats.failed:
+        print(f"Failed orders: {', '.join(stats.failed)}")
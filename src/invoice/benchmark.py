@@ -0,0 +1,62 @@
+"""Per-invoice render time with invoice resources prepared once per process, against
+resources built for every invoice with borb's standard fonts.
+
+    python -m src.invoice.benchmark --invoices 20 --lines 10
+"""
+import argparse
+import time
+from typing import Callable
+
+import pandas as pd
+from borb.pdf.canvas.font.simple_font.font_type_1 import StandardType1Font
+
+from .base import SELLER, InvoiceInfo, InvoiceResources, InvoiceType, get_invoice_resources
+from .vat import VATInvoice
+
+
+def sample_invoice_info(lines: int) -> InvoiceInfo:
+    order_df = pd.DataFrame({
+        "order_id": "benchmark",
+        "order_date": "2022-01-31",
+        "manager_name": "Manager",
+        "product_id": [f"p{i}" for i in range(lines)],
+        "product_name": [f"Product {i}" for i in range(lines)],
+        "quantity": 2,
+        "price": 12.5,
+        "sum": 25.,
+        "sum_vat": 30.25,
+        "payment_due": "2022-03-02",
+    })
+    return InvoiceInfo(
+        invoice_type=InvoiceType.VAT,
+        invoice_number="benchmark",
+        invoice_date="2022-01-31",
+        buyer=SELLER,
+        seller=SELLER,
+        order_df=order_df,
+    )
+
+
+def seconds_per_invoice(invoice_info: InvoiceInfo, invoices: int,
+                        get_resources: Callable[[], InvoiceResources]) -> float:
+    start = time.perf_counter()
+    for _ in range(invoices):
+        VATInvoice(invoice_info, get_resources()).generate()
+    return (time.perf_counter() - start) / invoices
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--invoices", type=int, default=20)
+    parser.add_argument("--lines", type=int, default=10)
+    args = parser.parse_args()
+
+    invoice_info = sample_invoice_info(args.lines)
+    # warm up imports and the process-wide resources
+    VATInvoice(invoice_info).generate()
+    before = seconds_per_invoice(
+        invoice_info, args.invoices, lambda: InvoiceResources(font_type=StandardType1Font))
+    after = seconds_per_invoice(invoice_info, args.invoices, get_invoice_resources)
+    print(f"{args.invoices} invoices of {args.lines} lines, per invoice: "
+          f"rebuilt resources {before * 1000:.0f}ms, "
+          f"prepared resources {after * 1000:.0f}ms ({before / after:.1f}x)")
@@ -0,0 +1,51 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Type
+
+import pandas as pd
+from src.config import INVOICE_CACHE_SIZE
+
+from .base import InvoiceInfo, InvoiceTemplate
+
+
+def invoice_key(invoice_type: Type[InvoiceTemplate], invoice_info: InvoiceInfo) -> str:
+    """Hash of everything printed on the invoice"""
+    key = hashlib.sha256()
+    for value in [
+        invoice_type.__name__,
+        invoice_info.invoice_type.name,
+        invoice_info.invoice_number,
+        invoice_info.invoice_date,
+        invoice_info.buyer,
+        invoice_info.seller,
+        list(invoice_info.order_df.columns),
+    ]:
+        key.update(repr(value).encode())
+    key.update(pd.util.hash_pandas_object(invoice_info.order_df, index=False).values.tobytes())
+    return key.hexdigest()
+
+
+class InvoiceCache:
+    """Rendered invoice pdfs by content, shared by all sessions of the process"""
+
+    def __init__(self, max_size: int = INVOICE_CACHE_SIZE):
+        self.max_size = max_size
+        self._pdfs: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def render(self, invoice_type: Type[InvoiceTemplate], invoice_info: InvoiceInfo) -> bytes:
+        key = invoice_key(invoice_type, invoice_info)
+        with self._lock:
+            if key in self._pdfs:
+                self._pdfs.move_to_end(key)
+                return self._pdfs[key]
+        pdf = invoice_type(invoice_info).generate()
+        with self._lock:
+            self._pdfs[key] = pdf
+            while len(self._pdfs) > self.max_size:
+                self._pdfs.popitem(last=False)
+        return pdf
+
+
+invoice_cache = InvoiceCache()
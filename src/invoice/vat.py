@@ -8,8 +8,6 @@ from borb.pdf.canvas.layout.table.flexible_column_width_table import (
 )
 from borb.pdf.canvas.layout.table.table import TableCell
 from borb.pdf.canvas.layout.text.paragraph import Paragraph
-from config.paths import LOGO_PATH
-from src.apps import utils
 
 from .base import Font, InvoiceTemplate
 
@@ -31,14 +29,14 @@ class OrderSummaryItems(Enum):
 
 
 class VATInvoice(InvoiceTemplate):
-    def generate(self):
+    def generate(self) -> bytes:
         layout = self.initialize_document()
-        layout.add(self.get_logo_image(LOGO_PATH))
+        layout.add(self.get_logo_image())
         layout.add(self.get_title())
         layout.add(self.get_buyer_seller_info())
         layout.add(self.build_item_table())
         layout.add(self.add_payment_info())
-        self.save_pdf()
+        return self.to_bytes()
 
     def build_item_table(self) -> Table:
         table = FTable(
@@ -53,12 +51,11 @@ class VATInvoice(InvoiceTemplate):
         table.set_padding_on_all_cells(Decimal(2), Decimal(2), Decimal(2), Decimal(2))
         return table
 
-    @staticmethod
-    def add_header(table: Table) -> Table:
+    def add_header(self, table: Table) -> Table:
         for column_name in ItemTableColumns:
             text = Paragraph(
                 column_name.value,
-                font=Font.bold,
+                font=self.fonts[Font.bold],
                 font_size=Decimal(10),
                 text_alignment=Alignment.CENTERED,
             )
@@ -69,7 +66,7 @@ class VATInvoice(InvoiceTemplate):
         add_cell = lambda text: TableCell(
             Paragraph(
                 str(text),
-                font=Font.default,
+                font=self.fonts[Font.default],
                 font_size=Decimal(8),
                 text_alignment=Alignment.CENTERED,
             )
@@ -84,14 +81,16 @@ class VATInvoice(InvoiceTemplate):
 
     def add_sums(self, table: Table) -> Table:
         cell = lambda text, align=Alignment.CENTERED, col_span=1: TableCell(
-            Paragraph(str(text), font=Font.bold, font_size=Decimal(8), text_alignment=align),
+            Paragraph(
+                str(text), font=self.fonts[Font.bold], font_size=Decimal(8), text_alignment=align
+            ),
             col_span=col_span,
             border_bottom=False,
             border_top=False,
             border_left=False,
             border_right=False,
         )
-        order_summary = utils.calculate_order_summary(self.invoice_info.order_df)
+        order_summary = self.invoice_info.order_totals.to_dict()
         for item in OrderSummaryItems:
             table.add(cell(item.value, Alignment.RIGHT, col_span=table._number_of_columns - 1))
             table.add(cell(order_summary[item.value]))
@@ -0,0 +1,150 @@
+from dataclasses import dataclass
+from typing import Dict, List, Union
+
+import numpy as np
+import pandas as pd
+
+from src.config import VAT
+
+CENTS = 100  # amounts are integer cents
+FACTOR_SCALE = 10_000  # pricing factors, discount and VAT rates to 4 decimals
+SCALED_DECIMALS = 6  # scaled values are rounded to these first, dropping float error
+AMOUNT_COLUMNS = [
+    "price",
+    "discount_amount",
+    "price_with_vat",
+    "price_with_discount",
+    "price_with_discount_vat",
+    "sum",
+    "sum_vat",
+]
+
+ArrayLike = Union[np.ndarray, pd.Series, float]
+
+
+def round_half_up(values: np.ndarray) -> np.ndarray:
+    """The one rounding policy, halves are rounded away from zero"""
+    return np.sign(values) * np.floor(np.abs(values) + 0.5)
+
+
+def to_scaled(values: ArrayLike, scale: int) -> np.ndarray:
+    """Decimal values as int64 multiples of 1 / scale"""
+    scaled = np.asarray(values, dtype="float64") * scale
+    # binary error of the float, e.g. 1.015 * 100 == 101.49999999999999, is not a fraction
+    return round_half_up(np.round(scaled, SCALED_DECIMALS)).astype("int64")
+
+
+def to_amount(cents: np.ndarray) -> np.ndarray:
+    return cents / CENTS
+
+
+def scale_cents(cents: np.ndarray, numerator: np.ndarray, denominator: int) -> np.ndarray:
+    """cents * numerator / denominator rounded to whole cents in integer arithmetic"""
+    product = cents * numerator
+    return np.sign(product) * ((np.abs(product) + denominator // 2) // denominator)
+
+
+@dataclass(frozen=True)
+class OrderTotals:
+    total_cents: int
+    total_vat_cents: int
+
+    @property
+    def vat_cents(self) -> int:
+        return self.total_vat_cents - self.total_cents
+
+    @staticmethod
+    def format(cents: int) -> str:
+        return f"{cents / CENTS:.2f}"
+
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            "Total sum EUR": self.format(self.total_cents),
+            "VAT EUR": self.format(self.vat_cents),
+            "Total sum with VAT EUR": self.format(self.total_vat_cents),
+        }
+
+    @classmethod
+    def from_stored_lines(cls, order_df: pd.DataFrame) -> "OrderTotals":
+        """Totals of order lines read back from the database, where only euro amounts are kept.
+        Orders priced in this process have their totals in PricedOrder"""
+        return cls(
+            total_cents=int(to_scaled(order_df["sum"], CENTS).sum()),
+            total_vat_cents=int(to_scaled(order_df["sum_vat"], CENTS).sum()),
+        )
+
+
+@dataclass(frozen=True)
+class PricedOrder:
+    """Priced order frame with the line sums in cents its amounts were computed from,
+    positions of the cent arrays match the frame rows"""
+
+    df: pd.DataFrame
+    sum_cents: np.ndarray
+    sum_vat_cents: np.ndarray
+
+    @property
+    def totals(self) -> OrderTotals:
+        return OrderTotals(int(self.sum_cents.sum()), int(self.sum_vat_cents.sum()))
+
+    def take(self, positions: List[int]) -> "PricedOrder":
+        return PricedOrder(self.df.iloc[positions].reset_index(drop=True),
+                           self.sum_cents[positions], self.sum_vat_cents[positions])
+
+    def append(self, other: "PricedOrder") -> "PricedOrder":
+        return PricedOrder(
+            pd.concat([self.df, other.df]).reset_index(drop=True),
+            np.concatenate([self.sum_cents, other.sum_cents]),
+            np.concatenate([self.sum_vat_cents, other.sum_vat_cents]),
+        )
+
+
+class PricingEngine:
+    """Order line amounts in int64 cents.
+
+    Unit amounts are rounded to cents once, with round_half_up, line sums are unit amounts times
+    quantity, so they and the order totals are exact and match the printed unit prices.
+    """
+
+    def __init__(self, vat: float = VAT):
+        self.vat_scaled = int(to_scaled(vat, FACTOR_SCALE))
+
+    def unit_price_cents(self, cost: ArrayLike, pricing_factor: ArrayLike) -> np.ndarray:
+        return scale_cents(
+            to_scaled(cost, CENTS), to_scaled(pricing_factor, FACTOR_SCALE), FACTOR_SCALE
+        )
+
+    def unit_price(self, cost: float, pricing_factor: float) -> float:
+        return float(to_amount(self.unit_price_cents(cost, pricing_factor)))
+
+    def price_lines(self, cost: ArrayLike, pricing_factor: ArrayLike, discount: ArrayLike,
+                    quantity: ArrayLike) -> Dict[str, np.ndarray]:
+        """Line amounts in cents by order column name, discount in percent"""
+        price = self.unit_price_cents(cost, pricing_factor)
+        discount_amount = scale_cents(
+            price, to_scaled(discount, FACTOR_SCALE), 100 * FACTOR_SCALE)
+        price_with_discount = price - discount_amount
+        price_with_discount_vat = scale_cents(price_with_discount, self.vat_scaled, FACTOR_SCALE)
+        quantity = np.asarray(quantity, dtype="int64")
+        return {
+            "price": price,
+            "discount_amount": discount_amount,
+            "price_with_vat": scale_cents(price, self.vat_scaled, FACTOR_SCALE),
+            "price_with_discount": price_with_discount,
+            "price_with_discount_vat": price_with_discount_vat,
+            "sum": price_with_discount * quantity,
+            "sum_vat": price_with_discount_vat * quantity,
+        }
+
+    def price_order(self, order_df: pd.DataFrame) -> PricedOrder:
+        """Order frame with AMOUNT_COLUMNS added as euros, exact to the cent, and its totals"""
+        lines = self.price_lines(
+            order_df["cost"], order_df["pricing_factor"], order_df["discount"],
+            order_df["quantity"])
+        df = order_df.assign(**{
+            column: to_amount(lines[column]) for column in AMOUNT_COLUMNS
+        })
+        return PricedOrder(df, lines["sum"], lines["sum_vat"])
+
+
+pricing_engine = PricingEngine()
@@ -1,45 +1,95 @@
-import json
-import re
 from abc import ABC, abstractmethod
-from datetime import datetime
-from typing import Any, Dict, List
+from dataclasses import dataclass, replace
+from datetime import date, datetime
+from enum import Enum
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, List, Tuple, Type
 
 import pandas as pd
-from pydantic.json import pydantic_encoder
 
 from config.formats import DATE_FORMAT, TIMESTAMP_FORMAT
 from src.apps.utils import generate_id
-from src.entities import Entity
+from src.entities import Entity, FlatField
+from src.pricing import PricedOrder, pricing_engine
 
 NEGATIVE_QUANTITY_TYPES = ["stock refill", "return"]
-VAT = 1.21
 
 
-class ProcessingStrategy(ABC):
-    @staticmethod
-    def _serialize_entity(entity: Entity) -> Dict[str, Any]:
-        return json.loads(json.dumps(entity, indent=2, default=pydantic_encoder))
+def _json_value(value: Any) -> Any:
+    # same values as a json dump with pydantic_encoder gives
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+
+def _enum_value(value: Any) -> Any:
+    return value.value if isinstance(value, Enum) else value
+
+
+def _date_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def _value_converter(attribute_type: Any) -> Callable[[Any], Any]:
+    if isinstance(attribute_type, type) and issubclass(attribute_type, Enum):
+        return _enum_value
+    if isinstance(attribute_type, type) and issubclass(attribute_type, date):
+        return _date_value
+    if isinstance(attribute_type, type) and attribute_type in (str, int, float, bool):
+        return lambda x: x
+    return _json_value
+
+
+@dataclass(frozen=True)
+class EntityFlattener:
+    """Table row columns of an entity type, compiled once from Entity.flat_fields.
+
+    Enums and dates become their json values, the same row as a json dump of the entity
+    flattened by json_normalize gives.
+    """
+
+    entity_type: Type[Entity]
+    columns: Tuple[str, ...]
+    getters: Tuple[Callable[[Entity], Any], ...]
+
+    @classmethod
+    def compile(cls, entity_type: Type[Entity]) -> "EntityFlattener":
+        fields = entity_type.flat_fields()
+        return cls(entity_type, tuple(x.column for x in fields),
+                   tuple(cls._getter(x) for x in fields))
 
     @staticmethod
-    def _entity_dict_to_df(entity_dict: Dict[str, Any]) -> pd.DataFrame:
-        nested_column_separator = "__"
-        pattern_to_replace = f"{nested_column_separator}.*{nested_column_separator}"
+    def _getter(field: FlatField) -> Callable[[Entity], Any]:
+        get = attrgetter(".".join(field.path))
+        convert = _value_converter(field.type)
+        return lambda x: convert(get(x))
 
-        def replace_nested_suffix(x):
-            return re.sub(pattern_to_replace, "", x)
+    def to_df(self, entity_list: List[Entity]) -> pd.DataFrame:
+        """One row per entity, built column by column"""
+        return pd.DataFrame({
+            column: [getter(entity) for entity in entity_list]
+            for column, getter in zip(self.columns, self.getters)
+        }, columns=list(self.columns))
 
-        return pd.json_normalize([entity_dict], sep=nested_column_separator).rename(
-            columns=lambda x: replace_nested_suffix(x)
-        )
 
+@lru_cache(maxsize=None)
+def get_flattener(entity_type: Type[Entity]) -> EntityFlattener:
+    return EntityFlattener.compile(entity_type)
+
+
+class ProcessingStrategy(ABC):
     @staticmethod
-    def _add_timestamp(df: pd.DataFrame) -> pd.DataFrame:
-        return df.assign(timestamp=datetime.now().strftime(TIMESTAMP_FORMAT))
+    def _entities_to_df(entity_list: List[Entity]) -> pd.DataFrame:
+        """Flattened frame of entities of one type, one row per entity"""
+        return get_flattener(type(entity_list[0])).to_df(entity_list)
 
-    @classmethod
-    def _preprocess(cls, entity: Entity) -> pd.DataFrame:
-        entity_dict = cls._serialize_entity(entity)
-        return cls._entity_dict_to_df(entity_dict).pipe(cls._add_timestamp)
+    @staticmethod
+    def add_timestamp(df: pd.DataFrame) -> pd.DataFrame:
+        """Rows stamped with the current time, as written to history tables"""
+        return df.assign(timestamp=datetime.now().strftime(TIMESTAMP_FORMAT))
 
     @abstractmethod
     def process(self, entity_list: List[Entity]) -> pd.DataFrame:
@@ -48,32 +98,31 @@ class ProcessingStrategy(ABC):
 
 class DefaultProcessing(ProcessingStrategy):
     def process(self, entity_list: List[Entity]) -> pd.DataFrame:
-        return self._preprocess(entity_list[0])
+        return self._entities_to_df(entity_list[:1]).pipe(self.add_timestamp)
 
 
 class OrderProcessing(ProcessingStrategy):
     def process(self, entity_list: List[Entity]) -> pd.DataFrame:
-        return (
-            pd.concat([self._preprocess(entity) for entity in entity_list])
-            .pipe(self.add_order_amounts)
+        return self.price(entity_list).df
+
+    def price(self, entity_list: List[Entity]) -> PricedOrder:
+        """Order rows with their amounts, and the order totals in cents they were priced with"""
+        priced = self._entities_to_df(entity_list) \
+            .pipe(self.add_timestamp) \
+            .pipe(self.negate_quantities) \
+            .pipe(pricing_engine.price_order)
+        return replace(priced, df=(
+            priced.df
             .pipe(self.calculate_payment_due)
             .reset_index(drop=True)
             .assign(order_id=generate_id())
-        )
+        ))
 
     @staticmethod
-    def add_order_amounts(order_df: pd.DataFrame) -> pd.DataFrame:
+    def negate_quantities(order_df: pd.DataFrame) -> pd.DataFrame:
         if order_df["order_type"].unique()[0] in NEGATIVE_QUANTITY_TYPES:
             order_df["quantity"] = order_df["quantity"] * -1
-        return order_df.assign(
-            price=lambda x: x["cost"].mul(x["pricing_factor"]),
-            discount_amount=lambda x: x["price"].mul(x["discount"]).div(100),
-            price_with_vat=lambda x: x["price"] * VAT,
-            price_with_discount=lambda x: x["price"].sub(x["discount_amount"]),
-            price_with_discount_vat=lambda x: x["price_with_discount"] * VAT,
-            sum=lambda x: x["price_with_discount"] * x["quantity"],
-            sum_vat=lambda x: x["price_with_discount_vat"] * x["quantity"],
-        )
+        return order_df
 
     @staticmethod
     def calculate_payment_due(order_df: pd.DataFrame) -> pd.DataFrame:
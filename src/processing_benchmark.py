@@ -0,0 +1,82 @@
+"""Entity rows built by the schema-compiled flattener, against the previous json round trip,
+json_normalize and regex rename of every entity.
+
+    python -m src.processing_benchmark --entities 1 10000
+"""
+import argparse
+import json
+import re
+import time
+from datetime import date
+from typing import Any, Callable, Dict, List
+
+import pandas as pd
+from pydantic.json import pydantic_encoder
+
+import src.apps  # noqa: F401, src.processing is imported through the apps
+from src.entities import Customer, Entity, Manager, Orders, Product
+from src.processing import get_flattener
+
+
+def json_normalize_row(entity: Entity) -> pd.DataFrame:
+    """Previous DefaultProcessing path"""
+    entity_dict = json.loads(json.dumps(entity, indent=2, default=pydantic_encoder))
+    nested_column_separator = "__"
+    pattern_to_replace = f"{nested_column_separator}.*{nested_column_separator}"
+    return pd.json_normalize([entity_dict], sep=nested_column_separator).rename(
+        columns=lambda x: re.sub(pattern_to_replace, "", x)
+    )
+
+
+def json_normalize_df(entity_list: List[Entity]) -> pd.DataFrame:
+    return pd.concat([json_normalize_row(x) for x in entity_list], ignore_index=True)
+
+
+def sample_orders(entities: int) -> List[Orders]:
+    manager = Manager("m1", "Manager", "Riga", "user")
+    customer = Customer("c1", "Customer", "retail", 1.4, 30, "Address", "LT-00001", "Vilnius",
+                        "customer@example.com", "+370", "c1", "LT0001")
+    return [
+        Orders(
+            manager=manager,
+            customer=customer,
+            product=Product(f"p{i}", f"Product {i}", 10. + i, "category", "manufacturer"),
+            order_date=date(2022, 1, 31),
+            order_type="sale",
+            quantity=i % 7 + 1,
+            discount=5.,
+        )
+        for i in range(entities)
+    ]
+
+
+def seconds(flatten: Callable[[List[Entity]], pd.DataFrame], entity_list: List[Entity],
+            repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        flatten(entity_list)
+    return (time.perf_counter() - start) / repeat
+
+
+def compare(entity_list: List[Entity], repeat: int) -> Dict[str, Any]:
+    compiled = get_flattener(type(entity_list[0])).to_df
+    # pandas versions differ in the separators they leave in nested column names
+    expected = json_normalize_df(entity_list).rename(columns=lambda x: x.split("__")[-1])
+    pd.testing.assert_frame_equal(compiled(entity_list), expected, check_like=True)
+    return {
+        "json_normalize": seconds(json_normalize_df, entity_list, repeat),
+        "compiled": seconds(compiled, entity_list, repeat),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entities", type=int, nargs="+", default=[1, 10_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for entities in args.entities:
+        result = compare(sample_orders(entities), args.repeat)
+        print(f"{entities} entities: json_normalize {result['json_normalize'] * 1000:.2f}ms, "
+              f"compiled {result['compiled'] * 1000:.2f}ms "
+              f"({result['json_normalize'] / result['compiled']:.0f}x)")
@@ -0,0 +1,56 @@
+import shutil
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from config.paths import DATABASE
+from src.database.executor import get_pool
+
+
+@pytest.fixture
+def database(tmp_path):
+    """Copy of the app database with the schema only, rows are added by each test"""
+    path = str(tmp_path / "sandeliapp.db")
+    shutil.copyfile(DATABASE, path)
+    connection = sqlite3.connect(path)
+    tables = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()
+    for (table_name,) in tables:
+        connection.execute(f'DELETE FROM "{table_name}"')
+    connection.commit()
+    connection.close()
+    yield path
+    get_pool(path).close()
+
+
+ORDER_ROW = {
+    "order_id": "o1", "order_date": "2022-01-10", "order_type": "sale",
+    "manager_id": "m1", "manager_name": "Manager", "manager_location": "Vilnius",
+    "customer_id": "c1", "customer_name": "Customer",
+    "product_id": "p1", "product_name": "Phone", "product_category": "Phones",
+    "manufacturer": "Apple", "quantity": 1, "discount": 0., "price": 1., "discount_amount": 0.,
+    "price_with_vat": 1.21, "price_with_discount": 1., "price_with_discount_vat": 1.21,
+    "sum": 1., "sum_vat": 1.21, "payment_terms": 30, "payment_due": "2022-02-09 00:00:00",
+    "timestamp": "2022-01-10 10:00:00.000000",
+}
+
+
+@pytest.fixture
+def order_rows():
+    """Orders frame with one row per dict of column overrides"""
+    def build(*overrides):
+        return pd.DataFrame([{**ORDER_ROW, **row} for row in overrides])
+    return build
+
+
+@pytest.fixture
+def manager_rows():
+    """Manager frame with one row per (manager_id, manager_name, timestamp) tuple,
+    name and timestamp default when left out"""
+    def build(*rows):
+        defaults = ("Manager", "2022-01-01")
+        return pd.DataFrame([
+            (manager_id, name, "Vilnius", "admin", timestamp)
+            for manager_id, name, timestamp in (row + defaults[len(row) - 1:] for row in rows)
+        ], columns=["manager_id", "manager_name", "manager_location", "access", "timestamp"])
+    return build
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from src.database.cache import TableCache
+from src.database.exporter import Exporter
+from src.database.loader import Loader
+from src.database.tables import ManagerTable, OrdersTable
+
+
+@pytest.fixture
+def cache(database, manager_rows):
+    Exporter(database).append_df_to_database(manager_rows(
+        ("m1", "first", "2022-01-01"), ("m2", "second", "2022-01-01")), ManagerTable())
+    return TableCache(database, use_snapshots=False)
+
+
+def sessions(cache, count=2):
+    loaders = [Loader(cache) for _ in range(count)]
+    for loader in loaders:
+        loader.register([ManagerTable()])
+    return loaders
+
+
+def test_sessions_share_one_copy_of_the_data(cache):
+    first, second = sessions(cache)
+    first_df = first.data[ManagerTable.name()]
+    second_df = second.data[ManagerTable.name()]
+    assert first_df is not second_df
+    assert np.shares_memory(first_df["manager_name"].values, second_df["manager_name"].values)
+    assert cache.version(ManagerTable.name()) == 1
+
+
+def test_mutations_in_one_session_do_not_leak(cache):
+    first, second = sessions(cache)
+    original = second.data[ManagerTable.name()].copy()
+
+    df = first.data[ManagerTable.name()]
+    with pytest.raises(ValueError):
+        df.loc[0, "manager_name"] = "changed"
+    with pytest.raises(ValueError):
+        df["manager_name"].values[0] = "changed"
+    df["added"] = 1
+    df.drop(columns="access", inplace=True)
+    df.sort_values("manager_id", ascending=False, inplace=True)
+
+    assert second.data[ManagerTable.name()].equals(original)
+    assert first.data[ManagerTable.name()].equals(original)
+
+
+def test_writes_to_any_column_dtype_do_not_leak(database, order_rows):
+    Exporter(database).append_df_to_database(order_rows(
+        {"order_id": "o1"},
+        {"order_id": "o2", "order_type": "return", "quantity": 2, "payment_terms": 60},
+    ), OrdersTable())
+    loader = Loader(TableCache(database, use_snapshots=False))
+    loader.register([OrdersTable()])
+    original = loader.data[OrdersTable.name()].copy()
+    # one column of each dtype the loader produces, backed by numpy or extension arrays
+    assert {str(x) for x in original.dtypes} >= {
+        "object", "category", "int64", "float64", "datetime64[ns]"}
+
+    df = loader.data[OrdersTable.name()]
+    for position in range(df.shape[1]):
+        try:
+            df.iloc[0, position] = df.iloc[1, position]
+        except (ValueError, TypeError):
+            pass  # the shared arrays are read only
+    assert loader.data[OrdersTable.name()].equals(original)
+
+
+def test_copies_can_be_modified(cache):
+    first, _ = sessions(cache)
+    df = first.data[ManagerTable.name()].copy()
+    df.loc[0, "manager_name"] = "changed"
+    assert first.data[ManagerTable.name()].loc[0, "manager_name"] == "first"
+
+
+def test_refresh_publishes_a_new_version(database, cache, manager_rows):
+    first, second = sessions(cache)
+    before = first.data[ManagerTable.name()]
+    Exporter(database).append_df_to_database(
+        manager_rows(("m3", "third", "2022-01-02")), ManagerTable())
+    first.update(ManagerTable())
+
+    assert cache.version(ManagerTable.name()) == 2
+    assert before["manager_id"].tolist() == ["m1", "m2"]
+    assert second.data[ManagerTable.name()]["manager_id"].tolist() == ["m1", "m2", "m3"]
+
+
+def test_invalidated_tables_are_reloaded(cache):
+    first, _ = sessions(cache)
+    first.data[ManagerTable.name()]
+    cache.invalidate(ManagerTable.name())
+    assert not cache.is_loaded(ManagerTable.name())
+    assert cache.get(ManagerTable()).version == 3
+
+
+def test_derived_structures_are_built_once_per_version(cache):
+    first, second = sessions(cache)
+    built = []
+
+    def build(df):
+        built.append(df.shape[0])
+        return df.shape[0]
+
+    assert first.derived(ManagerTable.name(), "rows", build) == 2
+    assert second.derived(ManagerTable.name(), "rows", build) == 2
+    assert built == [2]
+
+
+def test_lookup_returns_first_matching_row(cache):
+    first, _ = sessions(cache)
+    assert first.lookup(ManagerTable.name(), "manager_name", "second")["manager_id"] == "m2"
+    assert first.lookup(ManagerTable.name(), "manager_name", "missing") is None
+
@@ -0,0 +1,38 @@
+import pytest
+
+from src.database.cache import TableCache
+from src.database.changes import ChangeLog
+from src.database.exporter import Exporter
+from src.database.tables import ManagerTable, ProductTable
+
+
+def test_every_write_bumps_the_counter_of_its_table(database, manager_rows):
+    change_log = ChangeLog(database)
+    assert change_log.counters() == {}
+    Exporter(database).append_df_to_database(manager_rows(("m1",)), ManagerTable())
+    Exporter(database).append_df_to_database(manager_rows(("m2",), ("m3",)), ManagerTable())
+    assert change_log.counters() == {"manager": 2}
+
+
+def test_failed_writes_leave_counters_unchanged(database, manager_rows):
+    Exporter(database).append_df_to_database(manager_rows(("m1",)), ManagerTable())
+    with pytest.raises(Exception):
+        Exporter(database).append_df_to_database(
+            manager_rows(("m2",)).rename(columns={"access": "missing"}), ManagerTable())
+    assert ChangeLog(database).counters() == {"manager": 1}
+
+
+def test_only_written_tables_are_refreshed(database, manager_rows):
+    Exporter(database).append_df_to_database(manager_rows(("m1",)), ManagerTable())
+    cache = TableCache(database, poll_interval=60., use_snapshots=False)
+    cache.get(ManagerTable())
+    cache.get(ProductTable())
+    assert cache.refresh_changed(force=True) == []
+
+    # written by another process, seen through the change log only
+    Exporter(database).append_df_to_database(manager_rows(("m2",)), ManagerTable())
+    assert cache.refresh_changed() == []  # polled within the interval
+    assert cache.refresh_changed(force=True) == [ManagerTable.name()]
+    assert cache.get(ManagerTable()).data["manager_id"].tolist() == ["m1", "m2"]
+    assert cache.version(ProductTable.name()) == 1
+    assert cache.refresh_changed(force=True) == []
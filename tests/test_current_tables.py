@@ -0,0 +1,60 @@
+import sqlite3
+
+import pytest
+
+from src.database import queries
+from src.database.cache import TableCache
+from src.database.exporter import Exporter
+from src.database.storage import ensure_table_storage
+from src.database.tables import InventoryTable, ManagerTable
+
+
+def table_names(database):
+    with sqlite3.connect(database) as connection:
+        rows = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        return {row[0] for row in rows}
+
+
+@pytest.fixture
+def cache(database):
+    return TableCache(database, incremental=True, use_snapshots=False)
+
+
+def test_only_latest_row_tables_read_current_tables():
+    assert isinstance(ManagerTable(use_current_table=True).get_query(), queries.CurrentRowQuery)
+    assert isinstance(
+        InventoryTable(use_current_table=True).get_query(), queries.StockLedgerQuery)
+    assert not InventoryTable(use_current_table=True).reads_current_table
+
+
+def test_current_tables_are_not_created_for_other_queries(database):
+    ensure_table_storage(InventoryTable(use_current_table=True), database)
+    assert "orders_current" not in table_names(database)
+
+
+def test_current_table_keeps_latest_versions(database, cache, manager_rows):
+    table = ManagerTable(use_current_table=True)
+    exporter = Exporter(database)
+    exporter.append_df_to_database(manager_rows(
+        ("m1", "first", "2022-01-02"), ("m2", "other", "2022-01-02")), table)
+    assert "manager_current" in table_names(database)
+    assert cache.get(table).data["manager_name"].tolist() == ["first", "other"]
+
+    exporter.append_df_to_database(manager_rows(
+        ("m1", "renamed", "2022-01-03"), ("m2", "stale", "2022-01-01")), table)
+    with sqlite3.connect(database) as connection:
+        current = dict(connection.execute("SELECT manager_id, manager_name FROM manager_current"))
+    assert current == {"m1": "renamed", "m2": "other"}
+    refreshed = cache.refresh(table).data
+    assert refreshed.set_index("manager_id")["manager_name"].to_dict() == current
+    assert cache.refresh(table, incremental=False).data \
+        .set_index("manager_id")["manager_name"].to_dict() == current
+
+
+def test_current_table_is_built_from_existing_history(database, manager_rows):
+    Exporter(database).append_df_to_database(manager_rows(
+        ("m1", "old", "2022-01-01"), ("m1", "new", "2022-01-02")), ManagerTable())
+    ensure_table_storage(ManagerTable(use_current_table=True), database)
+    with sqlite3.connect(database) as connection:
+        assert connection.execute("SELECT manager_name FROM manager_current").fetchall() == [
+            ("new",)]
@@ -0,0 +1,114 @@
+import random
+from datetime import date, timedelta
+
+import pandas as pd
+
+from src.database.cache import TableCache
+from src.database.exporter import Exporter
+from src.database.loader import Loader
+from src.database.tables import DiscountTable
+from src.discount_index import DiscountIndex, DiscountInterval, DiscountIntervals, \
+    get_discount_index
+from src.entities import DiscountLevel, Product
+
+PHONE = Product(product_id="p1", product_name="Phone", cost=1., product_category="Phones",
+                manufacturer="Apple")
+
+
+def interval(discount_id, start, end, percent=10., level=DiscountLevel.product_name,
+             identifier="Phone"):
+    return DiscountInterval(discount_id, level, identifier, start, end, percent)
+
+
+def discount_df(*intervals):
+    return pd.DataFrame([{
+        "discount_id": x.discount_id, "discount_level": x.discount_level.value,
+        "discount_identifier": x.discount_identifier, "start_date": x.start_date.isoformat(),
+        "end_date": x.end_date.isoformat(), "discount_percent": x.discount_percent,
+        "timestamp": "2022-01-01 00:00:00.000000",
+    } for x in intervals])
+
+
+def test_start_and_end_dates_are_inclusive():
+    intervals = DiscountIntervals([interval("a", date(2022, 1, 10), date(2022, 1, 20))])
+    assert intervals.valid_on(date(2022, 1, 9)) is None
+    assert intervals.valid_on(date(2022, 1, 10)).discount_id == "a"
+    assert intervals.valid_on(date(2022, 1, 20)).discount_id == "a"
+    assert intervals.valid_on(date(2022, 1, 21)) is None
+
+
+def test_latest_start_wins_then_higher_percent():
+    intervals = DiscountIntervals([
+        interval("long", date(2022, 1, 1), date(2022, 12, 31)),
+        interval("short", date(2022, 3, 1), date(2022, 3, 31), percent=5.),
+        interval("short_higher", date(2022, 3, 1), date(2022, 3, 31), percent=7.),
+    ])
+    assert intervals.valid_on(date(2022, 3, 15)).discount_id == "short_higher"
+    # later starting discounts ended, the long one still applies
+    assert intervals.valid_on(date(2022, 6, 1)).discount_id == "long"
+
+
+def test_lookup_matches_a_scan_of_all_intervals():
+    rng = random.Random(7)
+    first = date(2022, 1, 1)
+    intervals = []
+    for number in range(300):
+        start = first + timedelta(days=rng.randrange(365))
+        end = start + timedelta(days=rng.randrange(60))
+        intervals.append(interval(str(number), start, end, percent=rng.randrange(5)))
+    index = DiscountIntervals(intervals)
+    for offset in range(-5, 430):
+        on_date = first + timedelta(days=offset)
+        valid = [x for x in index.intervals if x.start_date <= on_date <= x.end_date]
+        assert index.valid_on(on_date) == (valid[-1] if valid else None)
+        assert index.overlapping(on_date, on_date + timedelta(days=3)) == [
+            x for x in index.intervals
+            if x.start_date <= on_date + timedelta(days=3) and x.end_date >= on_date]
+
+
+def test_empty_intervals_find_nothing():
+    intervals = DiscountIntervals([])
+    assert intervals.valid_on(date(2022, 1, 1)) is None
+    assert intervals.overlapping(date(2022, 1, 1), date(2022, 12, 31)) == []
+
+
+def test_most_specific_level_is_resolved():
+    index = DiscountIndex(discount_df(
+        interval("maker", date(2022, 1, 1), date(2022, 1, 31), 3.,
+                 DiscountLevel.manufacturer, "Apple"),
+        interval("category", date(2022, 1, 10), date(2022, 1, 20), 5.,
+                 DiscountLevel.product_category, "Phones"),
+        interval("name", date(2022, 1, 15), date(2022, 1, 15), 9.),
+    ))
+    assert index.resolve(PHONE, date(2022, 1, 5)).discount_id == "maker"
+    assert index.resolve(PHONE, date(2022, 1, 12)).discount_id == "category"
+    assert index.resolve(PHONE, date(2022, 1, 15)).discount_id == "name"
+    assert index.resolve(PHONE, date(2022, 2, 1)) is None
+    assert [x.discount_id if x else None for x in index.resolve_many(
+        [PHONE, PHONE], date(2022, 1, 15))] == ["name", "name"]
+
+
+def test_overlapping_discounts_of_a_range():
+    index = DiscountIndex(discount_df(
+        interval("january", date(2022, 1, 1), date(2022, 1, 31)),
+        interval("march", date(2022, 3, 1), date(2022, 3, 31)),
+    ))
+    overlapping = index.overlapping(
+        DiscountLevel.product_name, "Phone", date(2022, 1, 31), date(2022, 3, 1))
+    assert [x.discount_id for x in overlapping] == ["january", "march"]
+    assert index.overlapping(DiscountLevel.product_name, "Phone", date(2022, 2, 1)) == []
+    assert index.overlapping(DiscountLevel.product_name, "Other", date(2022, 1, 1)) == []
+
+
+def test_index_is_built_from_all_discounts(database):
+    Exporter(database).append_df_to_database(discount_df(
+        interval("past", date(2001, 1, 1), date(2001, 1, 31)),
+        interval("future", date(2101, 1, 1), date(2101, 1, 31)),
+    ), DiscountTable())
+    loader = Loader(TableCache(database, use_snapshots=False))
+    loader.register([DiscountTable()])
+    index = get_discount_index(loader)
+    assert len(index) == 2
+    assert index.resolve(PHONE, date(2001, 1, 15)).discount_id == "past"
+    assert index.resolve(PHONE, date(2101, 1, 31)).discount_id == "future"
+    assert get_discount_index(loader) is index
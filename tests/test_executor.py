@@ -0,0 +1,108 @@
+import sqlite3
+import threading
+
+import pytest
+
+from src.database.executor import ConnectionPool, SqlExecutor, ensure_once
+
+
+def test_executor_reuses_pooled_connection(database):
+    executor = SqlExecutor(database)
+    with executor:
+        first = executor.connection
+    with executor:
+        second = executor.connection
+    assert first is second
+    assert executor.pool.stats.open_connections == 1
+    assert executor.pool.stats.checkouts == 2
+
+
+def test_connections_are_configured_once(database):
+    with SqlExecutor(database) as executor:
+        journal_mode = executor.cursor.execute("PRAGMA journal_mode").fetchone()[0]
+        synchronous = executor.cursor.execute("PRAGMA synchronous").fetchone()[0]
+    assert journal_mode == "wal"
+    assert synchronous == 1  # NORMAL
+
+
+def test_concurrent_threads_get_own_connections(database):
+    executor = SqlExecutor(database)
+    connections = []
+    barrier = threading.Barrier(2)
+
+    def read():
+        with executor:
+            barrier.wait()
+            connections.append(executor.connection)
+            executor.cursor.execute("SELECT 1").fetchone()
+            barrier.wait()
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(connections) == 2
+    assert connections[0] is not connections[1]
+    assert executor.pool.stats.open_connections == 2
+
+
+def test_exhausted_pool_times_out(database):
+    pool = ConnectionPool(database, max_connections=1, timeout=0.05)
+    connection = pool.acquire()
+    with pytest.raises(TimeoutError):
+        pool.acquire()
+    pool.release(connection)
+    assert pool.acquire() is connection
+    pool.release(connection)
+    pool.close()
+    assert pool.stats.open_connections == 0
+
+
+def test_failed_block_is_rolled_back(database):
+    executor = SqlExecutor(database)
+    with pytest.raises(ValueError):
+        with executor:
+            executor.cursor.execute(
+                "INSERT INTO manager VALUES ('m1', 'Name', 'Vilnius', 'admin', '2022-01-01')")
+            raise ValueError("write failed")
+    with executor:
+        assert executor.cursor.execute("SELECT COUNT(*) FROM manager").fetchone()[0] == 0
+
+
+def test_table_columns_are_read_once(database):
+    with SqlExecutor(database) as executor:
+        columns = executor.get_table_columns("manager")
+        executor.cursor.execute("ALTER TABLE manager ADD COLUMN note TEXT")
+        assert executor.get_table_columns("manager") == columns
+        executor.invalidate_schema_cache("manager")
+        assert executor.get_table_columns("manager") == columns + ["note"]
+
+
+def test_setup_runs_once_per_key():
+    calls = []
+
+    def setup(name):
+        calls.append(name)
+        return name
+
+    key = ("test", "runs once")
+    threads = [threading.Thread(target=ensure_once, args=(key, lambda: setup("first")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ["first"]
+    assert ensure_once(key, lambda: setup("again")) is None
+    assert ensure_once(("test", "other key"), lambda: setup("other")) == "other"
+
+
+def test_failed_setup_runs_again():
+    def fail():
+        raise sqlite3.OperationalError("database is locked")
+
+    key = ("test", "fails once")
+    with pytest.raises(sqlite3.OperationalError):
+        ensure_once(key, fail)
+    assert ensure_once(key, lambda: "created") == "created"
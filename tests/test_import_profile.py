@@ -0,0 +1,21 @@
+from src.import_profile import ModuleImport, deferred_imports, parse_importtime, profile_once
+
+
+def test_importtime_lines_are_parsed():
+    stderr = "\n".join([
+        "import time: self [us] | cumulative | imported package",
+        "import time:       120 |        120 |   src.config",
+        "import time:       300 |        420 | src.pricing",
+    ])
+    assert parse_importtime(stderr) == [
+        ModuleImport("src.config", 120, 120), ModuleImport("src.pricing", 300, 420)]
+
+
+def test_deferred_modules_are_matched_by_package():
+    imports = [ModuleImport(name, 1, 1) for name in
+               ["src.processing", "src.processing_benchmark", "src.invoice.vat", "borb.pdf"]]
+    assert deferred_imports(imports) == ["src.processing", "src.invoice.vat", "borb.pdf"]
+
+
+def test_app_start_does_not_import_processing_or_invoices():
+    assert deferred_imports(profile_once("src.apps")) == []
@@ -0,0 +1,20 @@
+import copy
+
+import pytest
+from borb.pdf.canvas.font.simple_font.font_type_1 import StandardType1Font
+
+from src.invoice.base import InvoiceFont
+
+
+@pytest.mark.parametrize("font_name", ["Helvetica", "Helvetica-Bold", "Courier", "Symbol"])
+def test_widths_match_borb(font_name):
+    font, reference = InvoiceFont(font_name), StandardType1Font(font_name)
+    for code in range(300):
+        assert font.get_width(code) == reference.get_width(code)
+
+
+def test_copies_share_measured_widths():
+    font = InvoiceFont("Helvetica")
+    copied = copy.deepcopy(font)
+    assert copied._widths is font._widths
+    assert copied.get_width(ord("W")) == font.get_width(ord("W"))
@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+
+from src.database.cache import TableCache
+from src.database.loader import Loader
+from src.database.tables import CustomerTable, ManagerTable, OrdersTable
+
+
+class SlowOrdersCache(TableCache):
+    """Holds the orders load until released"""
+
+    def __init__(self, database):
+        super().__init__(database, use_snapshots=False)
+        self.release = threading.Event()
+
+    def load_cold(self, table, change_counter):
+        if table.name() == OrdersTable.name():
+            assert self.release.wait(5)
+        return super().load_cold(table, change_counter)
+
+
+@pytest.fixture
+def loader(database):
+    loader = Loader(SlowOrdersCache(database))
+    loader.register([ManagerTable(), CustomerTable(), OrdersTable()])
+    return loader
+
+
+def test_page_renders_before_background_tables_load(loader):
+    progress = []
+    loader.ensure_loaded([OrdersTable, ManagerTable, CustomerTable],
+                         wait_for=[ManagerTable, CustomerTable], progress=progress.append)
+    assert set(loader.data) == {ManagerTable.name(), CustomerTable.name()}
+    assert set(progress[0]) == {ManagerTable.name(), CustomerTable.name()}
+    assert loader.time_to_first_render is not None
+
+    loader.cache.release.set()
+    assert loader.data[OrdersTable.name()].empty
+    assert set(loader.data) == {ManagerTable.name(), CustomerTable.name(), OrdersTable.name()}
+
+
+def test_without_wait_for_all_tables_are_loaded(loader):
+    loader.cache.release.set()
+    loader.ensure_loaded([OrdersTable, ManagerTable])
+    assert set(loader.data) == {ManagerTable.name(), OrdersTable.name()}
+    assert set(loader.load_times) == set(loader.data)
+
+
+def test_first_render_is_recorded_once(loader):
+    loader.ensure_loaded([ManagerTable])
+    first = loader.time_to_first_render
+    loader.ensure_loaded([CustomerTable])
+    assert loader.time_to_first_render == first
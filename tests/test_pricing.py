@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from src.pricing import OrderTotals, PricingEngine, round_half_up, scale_cents, to_scaled
+
+
+@pytest.mark.parametrize("value, expected", [
+    (0.5, 1), (1.5, 2), (2.5, 3), (-0.5, -1), (-2.5, -3), (0.49, 0),
+])
+def test_halves_are_rounded_away_from_zero(value, expected):
+    assert round_half_up(np.array([value]))[0] == expected
+
+
+def test_half_cents_are_rounded_up():
+    assert to_scaled([0.005, 1.015, -0.005], 100).tolist() == [1, 102, -1]
+    # 250 cents * 0.21 = 52.5 cents
+    assert scale_cents(np.array([250, -250]), 2_100, 10_000).tolist() == [53, -53]
+
+
+def test_line_sums_are_unit_prices_times_quantity():
+    lines = PricingEngine(vat=1.21).price_lines(
+        cost=[0.1], pricing_factor=[1.15], discount=[10.], quantity=[3])
+    # 11.5 cents rounds to 12, 10% off is 1.2 cents, rounded to 1
+    assert (lines["price"][0], lines["price_with_discount"][0]) == (12, 11)
+    assert lines["sum"][0] == 33
+    assert lines["sum_vat"][0] == lines["price_with_discount_vat"][0] * 3 == 39
@@ -0,0 +1,87 @@
+from datetime import date
+
+import pytest
+
+from src.database.tables import ORDER_COLUMNS, CustomerTable, DiscountTable
+from src.entities import Customer, Discount, Manager, Orders, Product
+from src.pricing import OrderTotals
+from src.processing import DefaultProcessing, EntityFlattener, OrderProcessing, get_flattener
+
+MANAGER = Manager(manager_id="m1", manager_name="Manager", manager_location="Vilnius",
+                  access="admin")
+CUSTOMER = Customer(
+    customer_id="c1", customer_name="Customer", customer_type="retail", pricing_factor=1.4,
+    payment_terms=30, address="Street 1", post_code="LT-01", customer_location="Vilnius",
+    email="c@example.com", telephone="+370", customer_code="1", vat_code="LT1")
+PRODUCT = Product(product_id="p1", product_name="Phone", cost=10., product_category="Phones",
+                  manufacturer="Apple")
+
+
+def order(quantity=1, order_type="sale", discount=0.):
+    return Orders(manager=MANAGER, customer=CUSTOMER, product=PRODUCT,
+                  order_date=date(2022, 1, 10), order_type=order_type, quantity=quantity,
+                  discount=discount)
+
+
+def test_nested_attributes_are_inlined_in_schema_order():
+    flattener = EntityFlattener.compile(Orders)
+    assert list(flattener.columns) == list(Orders.flat_schema())
+    assert flattener.columns[:4] == ("manager_id", "manager_name", "manager_location", "access")
+    assert dict((x.column, x.path) for x in Orders.flat_fields())["customer_type"] == (
+        "customer", "customer_type")
+
+
+def test_rows_hold_stored_values():
+    row = get_flattener(Orders).to_df([order()]).to_dict("records")[0]
+    assert row["manager_location"] == "Vilnius"
+    assert row["pricing_factor"] == 1.4
+    assert row["order_date"] == "2022-01-10"
+    assert row["product_name"] == "Phone"
+
+
+def test_flatteners_are_compiled_once():
+    assert get_flattener(Orders) is get_flattener(Orders)
+
+
+def test_entity_tables_store_flattened_columns():
+    df = DefaultProcessing().process([CUSTOMER])
+    assert df.columns.tolist() == CustomerTable().columns
+    discount = Discount(discount_id="d1", discount_level="manufacturer",
+                        discount_identifier="Apple", start_date=date(2022, 1, 1),
+                        end_date=date(2022, 1, 31), discount_percent=5.)
+    row = DefaultProcessing().process([discount]).to_dict("records")[0]
+    assert set(row) == set(DiscountTable().columns)
+    assert (row["discount_level"], row["start_date"]) == ("manufacturer", "2022-01-01")
+
+
+def test_order_rows_have_the_stored_order_columns():
+    df = OrderProcessing().process([order(2), order(1)])
+    assert set(ORDER_COLUMNS) <= set(df.columns)
+    assert df["order_id"].nunique() == 1
+    assert df["payment_due"].tolist() == ["2022-02-09", "2022-02-09"]
+
+
+@pytest.mark.parametrize("order_type", ["stock refill", "return"])
+def test_refills_and_returns_have_negative_quantities(order_type):
+    df = OrderProcessing().process([order(3, order_type)])
+    assert df["quantity"].tolist() == [-3]
+    assert df["sum"].tolist() == [-42.]
+
+
+def test_order_totals_are_the_engine_cents():
+    rows = [order(1, discount=3.3), order(7), order(2, discount=12.5)]
+    priced = OrderProcessing().price(rows)
+    assert priced.totals == OrderTotals(int(priced.sum_cents.sum()),
+                                        int(priced.sum_vat_cents.sum()))
+    assert priced.totals == OrderTotals.from_stored_lines(priced.df)
+    assert priced.df["sum"].tolist() == (priced.sum_cents / 100).tolist()
+
+
+def test_priced_orders_keep_cents_aligned_with_rows():
+    priced = OrderProcessing().price([order(1), order(2), order(3)])
+    taken = priced.take([2, 0])
+    assert taken.df["quantity"].tolist() == [3, 1]
+    assert taken.sum_cents.tolist() == [priced.sum_cents[2], priced.sum_cents[0]]
+    appended = taken.append(priced.take([1]))
+    assert appended.df.index.tolist() == [0, 1, 2]
+    assert appended.totals == priced.totals
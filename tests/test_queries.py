@@ -0,0 +1,104 @@
+import pandas as pd
+import pytest
+
+from src.database import queries
+from src.database.cache import TableCache
+from src.database.exporter import Exporter
+from src.database.tables import InventoryTable, ManagerTable
+
+
+@pytest.fixture
+def cache(database):
+    return TableCache(database, incremental=True, use_snapshots=False)
+
+
+def latest_row_query():
+    return queries.LatestRowQuery(
+        table_name="manager", groupby_columns=["manager_id"], sort_column="timestamp")
+
+
+def test_latest_row_merge_replaces_older_versions(manager_rows):
+    df = manager_rows(("m1", "old", "2022-01-01"), ("m2", "kept", "2022-01-01"))
+    delta = manager_rows(("m1", "new", "2022-01-02"), ("m3", "added", "2022-01-02"))
+    merged = latest_row_query().merge_delta(df, delta)
+    # superseded rows are replaced by the delta row, appended after cached rows
+    assert merged["manager_id"].tolist() == ["m2", "m1", "m3"]
+    assert merged["manager_name"].tolist() == ["kept", "new", "added"]
+
+
+def test_latest_row_merge_keeps_newer_cached_version(manager_rows):
+    df = manager_rows(("m1", "newer", "2022-01-02"))
+    # committed after the load, but stamped before the cached version
+    delta = manager_rows(("m1", "late", "2022-01-01"))
+    merged = latest_row_query().merge_delta(df, delta)
+    assert merged["manager_name"].tolist() == ["newer"]
+
+
+def test_latest_row_merge_prefers_delta_on_equal_sort_value(manager_rows):
+    df = manager_rows(("m1", "cached", "2022-01-01"))
+    delta = manager_rows(("m1", "written", "2022-01-01"))
+    assert latest_row_query().merge_delta(df, delta)["manager_name"].tolist() == ["written"]
+
+
+def test_grouped_sum_merge_adds_sums():
+    query = queries.GroupedSumQuery(
+        table_name="orders", groupby_columns=["product_name"], column_to_sum="quantity")
+    df = pd.DataFrame({"product_name": ["a", "b"], "sum_quantity": [5, 3]})
+    delta = pd.DataFrame({"product_name": ["b", "c"], "sum_quantity": [4, 1]})
+    merged = query.merge_delta(df, delta)
+    assert merged.to_dict("list") == {"product_name": ["b", "a", "c"], "sum_quantity": [7, 5, 1]}
+
+
+def test_refresh_reads_rows_committed_late_with_older_timestamps(database, cache, manager_rows):
+    exporter = Exporter(database)
+    table = ManagerTable()
+    exporter.append_df_to_database(manager_rows(("m1", "first", "2022-01-02 10:00:00")), table)
+    assert cache.get(table).data["manager_id"].tolist() == ["m1"]
+
+    # stamped before the loaded row, committed after the load
+    exporter.append_df_to_database(manager_rows(
+        ("m2", "late", "2022-01-01 10:00:00"),
+        ("m1", "stale", "2022-01-01 09:00:00"),
+    ), table)
+    snapshot = cache.refresh(table)
+    assert snapshot.data.set_index("manager_id")["manager_name"].to_dict() == {
+        "m1": "first", "m2": "late"}
+
+    exporter.append_df_to_database(manager_rows(("m1", "renamed", "2022-01-03 10:00:00")), table)
+    refreshed = cache.refresh(table).data
+    full = cache.load_table_from_info(table)[0]
+    pd.testing.assert_frame_equal(
+        refreshed.sort_values("manager_id").reset_index(drop=True),
+        full.sort_values("manager_id").reset_index(drop=True))
+
+
+def test_watermark_is_rowid_and_zero_for_empty_table(database, cache, manager_rows):
+    table = ManagerTable()
+    assert cache.get(table).watermark == 0
+    Exporter(database).append_df_to_database(
+        manager_rows(("m1", "a", "2022-01-01"), ("m2", "b", "2022-01-01")), table)
+    snapshot = cache.refresh(table)
+    assert snapshot.watermark == 2
+    assert snapshot.data["manager_id"].tolist() == ["m1", "m2"]
+
+
+def test_inventory_refresh_adds_late_orders(database, cache, order_rows):
+    exporter = Exporter(database)
+    table = InventoryTable()
+    exporter.append_df_to_database(order_rows(
+        {"product_name": "a", "quantity": 5, "timestamp": "2022-01-02"}), table)
+    assert cache.get(table).data.to_dict("list") == {
+        "product_name": ["a"], "sum_quantity": [5]}
+
+    exporter.append_df_to_database(order_rows(
+        {"product_name": "a", "quantity": -2, "timestamp": "2022-01-01"},
+        {"product_name": "b", "quantity": 1, "timestamp": "2022-01-01"},
+    ), table)
+    assert cache.refresh(table).data.to_dict("list") == {
+        "product_name": ["a", "b"], "sum_quantity": [3, 1]}
+
+
+def test_delta_queries_search_by_rowid(database, cache):
+    for table in [ManagerTable(), InventoryTable()]:
+        steps = cache.get_query(table).explain(cache.executor, watermark=0)
+        assert any("USING INTEGER PRIMARY KEY (rowid>?)" in step for step in steps)
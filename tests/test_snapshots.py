@@ -0,0 +1,108 @@
+import os
+
+import pandas as pd
+import pytest
+
+from src.database import snapshots
+from src.database.cache import TableCache
+from src.database.exporter import Exporter
+from src.config import HAS_PYARROW
+from src.database.snapshots import SnapshotStore
+from src.database.tables import ManagerTable
+
+pytestmark = pytest.mark.skipif(not HAS_PYARROW, reason="snapshots are stored as parquet")
+
+
+@pytest.fixture
+def store(database, tmp_path):
+    return SnapshotStore(database, str(tmp_path / "snapshots"))
+
+
+@pytest.fixture
+def write(database, manager_rows):
+    """Appends manager rows to the database"""
+    return lambda *rows: Exporter(database).append_df_to_database(
+        manager_rows(*rows), ManagerTable())
+
+
+def cold_start(database, store):
+    """Table of a new process, read through the snapshot store"""
+    return TableCache(database, snapshot_store=store).get(ManagerTable())
+
+
+def test_snapshots_round_trip(database, store, write):
+    write(("m1", "first"), ("m2", "second"))
+    loaded = cold_start(database, store).data
+    stored = store.read(ManagerTable())
+    assert stored.change_counter == 1 and stored.watermark == 2
+    pd.testing.assert_frame_equal(
+        TableCache.apply_dtypes(stored.data, ManagerTable()), loaded)
+
+
+def test_cold_start_reads_rows_newer_than_the_snapshot(database, store, monkeypatch, write):
+    write(("m1", "first"))
+    cold_start(database, store)
+    write(("m1", "renamed"), ("m2", "second"))
+
+    full_loads = []
+    original = TableCache.load_table_from_info
+    monkeypatch.setattr(TableCache, "load_table_from_info",
+                        lambda self, table: full_loads.append(table) or original(self, table))
+    snapshot = cold_start(database, store)
+    assert full_loads == []
+    assert snapshot.data["manager_name"].tolist() == ["renamed", "second"]
+    assert (snapshot.watermark, snapshot.change_counter) == (3, 2)
+    assert store.read(ManagerTable()).watermark == 3
+
+
+def test_snapshots_of_another_table_definition_are_ignored(database, store, write):
+    write(("m1", "first"))
+    cold_start(database, store)
+    table = ManagerTable()
+    table.columns = [x for x in table.columns if x != "access"]
+    assert store.read(table) is None
+    assert store.read(ManagerTable()) is not None
+
+
+def test_snapshots_of_another_format_version_are_ignored(database, store, monkeypatch, write):
+    write(("m1", "first"))
+    cold_start(database, store)
+    monkeypatch.setattr(snapshots, "SNAPSHOT_FORMAT_VERSION",
+                        snapshots.SNAPSHOT_FORMAT_VERSION + 1)
+    assert store.read(ManagerTable()) is None
+
+
+def test_snapshots_ahead_of_the_database_are_reloaded(database, store, manager_rows, write):
+    write(("m1", "first"))
+    store.write(ManagerTable(), manager_rows(("m9", "other database")), watermark=1,
+                change_counter=5)
+    snapshot = cold_start(database, store)
+    assert snapshot.data["manager_id"].tolist() == ["m1"]
+    assert store.read(ManagerTable()).change_counter == 1
+
+
+def test_snapshots_past_the_watermark_are_reloaded(database, store, manager_rows, write):
+    write(("m1", "first"))
+    # rowids went down, e.g. the table was emptied and written again
+    store.write(ManagerTable(), manager_rows(("m9", "deleted")), watermark=10, change_counter=1)
+    snapshot = cold_start(database, store)
+    assert snapshot.data["manager_id"].tolist() == ["m1"]
+    assert snapshot.watermark == 1
+
+
+def test_unreadable_snapshots_are_ignored(database, store, write):
+    write(("m1", "first"))
+    cold_start(database, store)
+    with open(store.file_path(ManagerTable()), "wb") as file:
+        file.write(b"broken")
+    assert store.read(ManagerTable()) is None
+    assert cold_start(database, store).data["manager_id"].tolist() == ["m1"]
+
+
+def test_databases_of_the_same_name_have_their_own_snapshots(tmp_path):
+    first = SnapshotStore(str(tmp_path / "a" / "sandeliapp.db"), str(tmp_path))
+    second = SnapshotStore(str(tmp_path / "b" / "sandeliapp.db"), str(tmp_path))
+    assert first.path != second.path
+    assert os.path.basename(first.path).startswith("sandeliapp_")
+    assert SnapshotStore(str(tmp_path / "a" / ".." / "a" / "sandeliapp.db"),
+                         str(tmp_path)).path == first.path
@@ -0,0 +1,66 @@
+import sqlite3
+
+import pytest
+
+from src.database.exporter import Exporter
+from src.database.indexes import derive_indexes
+from src.database.stock_ledger import StockLedger
+from src.database.tables import InventoryTable
+
+
+def balances(database):
+    with sqlite3.connect(database) as connection:
+        rows = connection.execute(
+            "SELECT product_name, sum_quantity, timestamp FROM stock_balance ORDER BY 1")
+        return rows.fetchall()
+
+
+def test_ledger_is_built_from_order_history(database, order_rows):
+    with sqlite3.connect(database) as connection:
+        order_rows(
+            {"product_name": "a", "quantity": 5, "timestamp": "2022-01-01"},
+            {"product_name": "a", "quantity": -2, "timestamp": "2022-01-03"},
+            {"product_name": "b", "quantity": 1, "timestamp": "2022-01-02"},
+        ).to_sql("orders", connection, if_exists="append", index=False)
+    ledger = StockLedger(database=database)
+    assert ledger.quantity_left("a") == 3
+    assert ledger.quantity_left("missing") == 0
+    assert balances(database) == [("a", 3, "2022-01-03"), ("b", 1, "2022-01-02")]
+
+
+def test_writes_update_balances_in_the_same_transaction(database, order_rows):
+    exporter = Exporter(database)
+    exporter.append_df_to_database(order_rows(
+        {"product_name": "a", "quantity": 5, "timestamp": "2022-01-02"},
+        {"product_name": "a", "quantity": 1, "timestamp": "2022-01-02"},
+    ), InventoryTable())
+    exporter.append_df_to_database(order_rows(
+        {"product_name": "a", "quantity": -4, "timestamp": "2022-01-03"},
+        {"product_name": "b", "quantity": 2, "timestamp": "2022-01-03"},
+    ), InventoryTable())
+    assert balances(database) == [("a", 2, "2022-01-03"), ("b", 2, "2022-01-03")]
+
+
+def test_older_rows_keep_latest_timestamp(database, order_rows):
+    exporter = Exporter(database)
+    exporter.append_df_to_database(order_rows(
+        {"product_name": "a", "quantity": 5, "timestamp": "2022-01-03"}), InventoryTable())
+    exporter.append_df_to_database(order_rows(
+        {"product_name": "a", "quantity": 1, "timestamp": "2022-01-01"}), InventoryTable())
+    assert balances(database) == [("a", 6, "2022-01-03")]
+
+
+def test_failed_write_leaves_balances_unchanged(database, order_rows):
+    exporter = Exporter(database)
+    exporter.append_df_to_database(order_rows({"product_name": "a", "quantity": 5}),
+                                   InventoryTable())
+    with pytest.raises(KeyError):
+        exporter.append_df_to_database(
+            order_rows({"product_name": "a", "quantity": 1}).drop(columns="payment_due"),
+            InventoryTable())
+    assert StockLedger(database=database).quantity_left("a") == 5
+
+
+def test_indexes_are_derived_for_the_ledger_only():
+    names = [index.name for index in derive_indexes(InventoryTable())]
+    assert names == ["ix_stock_balance_sum_quantity", "ix_stock_balance_timestamp"]
@@ -0,0 +1,94 @@
+import gzip
+import io
+import os
+import time
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from src.database.cache import TableCache
+from src.database.exporter import Exporter
+from src.config import HAS_PYARROW
+from src.database.table_export import ExportFormat, TableExport, sweep_exports
+from src.database.tables import DiscountTable, OrdersTable
+
+
+@pytest.fixture
+def orders(database, order_rows):
+    Exporter(database).append_df_to_database(order_rows(
+        {"order_id": "o1", "order_date": "2022-01-01", "payment_terms": 30},
+        {"order_id": "o2", "order_date": "2022-01-02", "payment_terms": None},
+        {"order_id": "o3", "order_date": "2022-01-03", "payment_terms": 60},
+    ), OrdersTable())
+    return database
+
+
+def export(database, export_format=ExportFormat.csv, **kwargs) -> bytes:
+    file = io.BytesIO()
+    TableExport(OrdersTable(), database=database, **kwargs).write(file, export_format)
+    return file.getvalue()
+
+
+def test_csv_keeps_stored_values(orders):
+    lines = export(orders, columns=["order_id", "order_date", "order_type", "payment_terms"]) \
+        .decode().splitlines()
+    assert lines == [
+        "order_id;order_date;order_type;payment_terms",
+        "o1;2022-01-01;sale;30",
+        "o2;2022-01-02;sale;",
+        "o3;2022-01-03;sale;60",
+    ]
+
+
+def test_loaded_frames_use_compact_dtypes_in_memory_only(orders):
+    df = TableCache(orders, use_snapshots=False).get(OrdersTable()).data
+    assert str(df["order_date"].dtype) == "datetime64[ns]"
+    assert str(df["order_type"].dtype) == "category"
+    assert b"2022-01-01 00:00:00" not in export(orders)
+
+
+def test_date_range_is_inclusive(orders):
+    csv = export(orders, columns=["order_id"], date_column="order_date",
+                 start_date=date(2022, 1, 2), end_date=date(2022, 1, 3))
+    assert csv.decode().split() == ["order_id", "o2", "o3"]
+
+
+def test_chunks_give_the_same_output(orders):
+    assert export(orders, chunk_size=1) == export(orders)
+
+
+def test_unknown_columns_are_rejected(orders):
+    with pytest.raises(ValueError):
+        export(orders, columns=["order_id", "1; DROP TABLE orders"])
+
+
+def test_empty_export_has_a_header(database):
+    file = io.BytesIO()
+    TableExport(DiscountTable(), ["discount_id", "start_date"], database=database).write(file)
+    assert file.getvalue().decode().split() == ["discount_id;start_date"]
+
+
+def test_gzip_decompresses_to_csv(orders):
+    assert gzip.decompress(export(orders, ExportFormat.csv_gzip)) == export(orders)
+
+
+@pytest.mark.skipif(not HAS_PYARROW, reason="pyarrow is not installed")
+def test_parquet_keeps_stored_values(orders):
+    df = pd.read_parquet(io.BytesIO(export(orders, ExportFormat.parquet, chunk_size=2)))
+    assert df["order_id"].tolist() == ["o1", "o2", "o3"]
+    assert df["order_date"].tolist() == ["2022-01-01", "2022-01-02", "2022-01-03"]
+
+
+def test_export_files_are_swept_by_age(orders, tmp_path):
+    path = str(tmp_path / "exports")
+    stale = TableExport(OrdersTable(), database=orders).write_file(path=path)
+    an_hour_ago = time.time() - 60 * 60 - 1
+    os.utime(stale, (an_hour_ago, an_hour_ago))
+    fresh = TableExport(OrdersTable(), database=orders).write_file(path=path)
+    assert not os.path.exists(stale)
+    assert os.listdir(path) == [os.path.basename(fresh)]
+    with open(fresh, "rb") as file:
+        assert file.read() == export(orders)
+    assert sweep_exports(path, max_age=0) == [fresh]
+    assert sweep_exports(str(tmp_path / "missing")) == []